@@ -1,8 +1,21 @@
-from flask import Flask, render_template, jsonify, request
+import math
+import time
+_startup_started = time.perf_counter()
+
+from flask import Flask, render_template, jsonify, request, Response
 from app.models import Database
-from app.stock_tracker import StockTracker
+from app.tracker_control import TrackerClient
+from app.metrics import render_prometheus
+from app.profiler import ProfilerBusy, folded_text
+from app import backtest
+from app.rules import RULE_TYPES
+from app.timeline import AvailabilityTimelines, WINDOWS
+from app import item_io
+from app import history
 import os
+import hmac
 from datetime import datetime
+from functools import wraps
 import atexit
 import threading
 from dotenv import load_dotenv
@@ -14,8 +27,20 @@ print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] app.py module loading,
 app = Flask(__name__)
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'your-secret-key-here')
 
-# Initialize database
-db = Database()
+# Initialize database (shared with worker.py processes in external mode)
+db = Database(os.environ.get('DATABASE_PATH', 'stock_tracker.db'))
+
+# 'embedded' runs the tracker inside this process, 'external' uses worker.py processes
+tracker_process = os.environ.get('TRACKER_PROCESS', 'embedded')
+
+# Seconds over which the first checks of bulk-imported items are spread
+import_spread = int(os.environ.get('IMPORT_SPREAD') or os.environ.get('CHECK_INTERVAL', '60'))
+
+# In-memory availability timelines for the dashboard, loaded on first request
+timelines = AvailabilityTimelines(db)
+
+# How items are fetched: a full browser page load, or a plain HTTP GET (no JavaScript)
+FETCH_MODES = ('browser', 'http')
 
 # Global tracker instance - ensure only one is created
 _tracker_instance = None
@@ -27,14 +52,13 @@ def get_tracker():
     with _tracker_lock:
         if _tracker_instance is None:
             print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Creating tracker instance, PID: {os.getpid()}")
-            # For low-resource environments (1 CPU, 1GB RAM), use only 1 concurrent check
-            # This prevents multiple browser instances from overwhelming the system
-            max_concurrent = int(os.environ.get('MAX_CONCURRENT_CHECKS', '1'))
-            check_interval = int(os.environ.get('CHECK_INTERVAL', '60'))  # Default to 60s for low resources
-            _tracker_instance = StockTracker(
-                check_interval=check_interval, 
-                max_concurrent_checks=max_concurrent
-            )
+            if tracker_process == 'external':
+                # Tracker runs in worker.py processes; talk to it through the database
+                _tracker_instance = TrackerClient(db)
+            else:
+                # Imported here so the external mode never loads Selenium
+                from app.stock_tracker import create_tracker
+                _tracker_instance = create_tracker(db)
     return _tracker_instance
 
 # Initialize tracker at module level if we're in the main process
@@ -45,6 +69,10 @@ if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
 else:
     tracker = None
 
+# Time from the start of the module import until the app can serve requests
+startup_seconds = time.perf_counter() - _startup_started
+print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] app.py ready in {startup_seconds * 1000:.0f} ms, PID: {os.getpid()}")
+
 # Register cleanup
 def cleanup_tracker():
     if tracker and tracker.running:
@@ -79,24 +107,69 @@ def get_items():
             item['created_at'] = datetime.fromisoformat(item['created_at']).strftime('%Y-%m-%d %H:%M:%S')
     return jsonify(items)
 
+@app.route('/api/items/timelines', methods=['GET'])
+def get_item_timelines():
+    """24h and 7d uptime and sparkline buckets of every item, from memory"""
+    try:
+        buckets = min(max(int(request.args.get('buckets', 48)), 1), 288)
+    except ValueError:
+        return jsonify({'error': 'buckets must be a number'}), 400
+    
+    timelines.sync()
+    return jsonify({
+        'buckets': buckets,
+        'windows': WINDOWS,
+        'items': timelines.summaries(buckets),
+    })
+
+def item_fields(data):
+    """Validated item fields from a request body, or an error message"""
+    data = data or {}
+    if not isinstance(data, dict):
+        return None, 'Expected a JSON object'
+    rule_type = data.get('rule_type', 'regex')
+    fetch_mode = data.get('fetch_mode', 'browser')
+    if rule_type not in RULE_TYPES:
+        return None, f'Invalid rule_type: {rule_type}'
+    if fetch_mode not in FETCH_MODES:
+        return None, f'Invalid fetch_mode: {fetch_mode}'
+    
+    # Structured rules read availability from the page's data and need no pattern
+    required_fields = ['url', 'name'] if rule_type == 'structured' else ['url', 'name', 'rule_pattern', 'rule_count']
+    for field in required_fields:
+        if data.get(field) is None:
+            return None, f'Missing required field: {field}'
+    for field in ('url', 'name', 'rule_pattern', 'end_marker'):
+        if data.get(field) is not None and not isinstance(data[field], str):
+            return None, f'{field} must be a string'
+    if not data['url'] or not data['name']:
+        return None, 'url and name must not be empty'
+    
+    try:
+        rule_count = int(data.get('rule_count', 1))
+    except (TypeError, ValueError):
+        return None, 'rule_count must be a number'
+    
+    return {
+        'url': data['url'],
+        'name': data['name'],
+        'rule_pattern': data.get('rule_pattern') or '',
+        'rule_count': rule_count,
+        'rule_type': rule_type,
+        'fetch_mode': fetch_mode,
+        # Optional text after which the rest of the page is ignored (and not downloaded in http mode)
+        'end_marker': data.get('end_marker') or None,
+    }, None
+
 @app.route('/api/items', methods=['POST'])
 def add_item():
     """Add a new item to track"""
-    data = request.json
-    
-    # Validate required fields
-    required_fields = ['url', 'name', 'rule_pattern', 'rule_count']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({'error': f'Missing required field: {field}'}), 400
+    fields, error = item_fields(request.json)
+    if error:
+        return jsonify({'error': error}), 400
     
     try:
-        item_id = db.add_item(
-            url=data['url'],
-            name=data['name'],
-            rule_pattern=data['rule_pattern'],
-            rule_count=int(data['rule_count'])
-        )
+        item_id = db.add_item(**fields)
         
         # Queue the new item for checking (non-blocking)
         try:
@@ -113,25 +186,73 @@ def add_item():
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@app.route('/api/items/import', methods=['POST'])
+def import_items():
+    """
+    Add many items from a CSV or JSON upload in one transaction.
+    
+    Every item is validated and its rule compiled first; nothing is added if
+    any is invalid. First checks are spread over `spread` seconds at normal
+    priority rather than queued as force checks.
+    """
+    fmt = request.args.get('format') or ('csv' if 'csv' in (request.mimetype or '') else 'json')
+    if fmt not in item_io.IMPORT_FORMATS:
+        return jsonify({'error': f'Invalid format: {fmt}'}), 400
+    try:
+        spread = float(request.args.get('spread', import_spread))
+        if not math.isfinite(spread):
+            # inf would put every first check at the end of time, nan nowhere at all
+            raise ValueError(f'Invalid spread: {spread}')
+        spread = max(spread, 0)
+        rows = item_io.parse_items(request.get_data(as_text=True), fmt)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    if not rows:
+        return jsonify({'error': 'No items to import'}), 400
+    
+    items, errors = [], []
+    for row_number, row in enumerate(rows, start=1):
+        fields, error = item_fields(row)
+        if not error:
+            error = backtest.validate_rule(fields['rule_pattern'], fields['rule_count'], fields['rule_type'],
+                                           fields['end_marker'])
+        if error:
+            errors.append({'row': row_number, 'error': error})
+        else:
+            items.append(fields)
+    if errors:
+        return jsonify({'error': f'{len(errors)} of {len(rows)} items are invalid', 'errors': errors}), 400
+    
+    try:
+        item_ids = db.add_items(items, item_io.first_check_times(len(items), spread, time.time()))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+    return jsonify({
+        'ids': item_ids,
+        'message': f'Imported {len(item_ids)} items',
+        'first_checks_over': spread,
+    }), 201
+
+@app.route('/api/items/export', methods=['GET'])
+def export_items():
+    """Stream every item as CSV or JSON, in a form the import accepts"""
+    fmt = request.args.get('format', 'json')
+    if fmt not in item_io.IMPORT_FORMATS:
+        return jsonify({'error': f'Invalid format: {fmt}'}), 400
+    
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/json'
+    return Response(item_io.export_items(db.iter_items(), fmt), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=items.{fmt}'})
+
 @app.route('/api/items/<int:item_id>', methods=['PUT'])
 def update_item(item_id):
     """Update an existing item"""
-    data = request.json
-    
-    # Validate required fields
-    required_fields = ['url', 'name', 'rule_pattern', 'rule_count']
-    for field in required_fields:
-        if field not in data:
-            return jsonify({'error': f'Missing required field: {field}'}), 400
+    fields, error = item_fields(request.json)
+    if error:
+        return jsonify({'error': error}), 400
     
     try:
-        db.update_item(
-            item_id=item_id,
-            url=data['url'],
-            name=data['name'],
-            rule_pattern=data['rule_pattern'],
-            rule_count=int(data['rule_count'])
-        )
+        db.update_item(item_id=item_id, **fields)
         
         # Queue the updated item for checking (non-blocking)
         try:
@@ -152,6 +273,7 @@ def delete_item(item_id):
     """Delete an item"""
     try:
         db.delete_item(item_id)
+        timelines.forget(item_id)
         return jsonify({'message': 'Item deleted successfully'}), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
@@ -172,6 +294,100 @@ def force_check_item(item_id):
     except Exception as e:
         return jsonify({'error': f'Failed to queue check: {str(e)}'}), 500
 
+def rule_from_request(item):
+    """Candidate rule from the request body, defaulting to the item's saved rule"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    return (data.get('rule_type', item['rule_type']), data.get('rule_pattern', item['rule_pattern']),
+            data.get('rule_count', item['rule_count']), data.get('end_marker', item['end_marker']) or None)
+
+@app.route('/api/items/<int:item_id>/rule/test', methods=['POST'])
+def test_item_rule(item_id):
+    """Evaluate a candidate rule against the item's latest stored page, without fetching it"""
+    item = db.get_item(item_id)
+    if not item:
+        return jsonify({'error': 'Item not found'}), 404
+    
+    rule_type, pattern, rule_count, end_marker = rule_from_request(item)
+    if rule_type not in RULE_TYPES:
+        return jsonify({'error': f'Invalid rule_type: {rule_type}'}), 400
+    error = backtest.validate_rule(pattern, rule_count, rule_type, end_marker)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    result = backtest.dry_run(db, item_id, pattern, int(rule_count), rule_type=rule_type,
+                               end_marker=end_marker)
+    if result is None:
+        return jsonify({'error': 'No page snapshot stored for this item yet; wait for its first check'}), 404
+    return jsonify(result)
+
+@app.route('/api/items/<int:item_id>/rule/backtest', methods=['POST'])
+def backtest_item_rule(item_id):
+    """Re-run a candidate rule over the item's archived pages and report the transitions it finds"""
+    item = db.get_item(item_id)
+    if not item:
+        return jsonify({'error': 'Item not found'}), 404
+    
+    rule_type, pattern, rule_count, end_marker = rule_from_request(item)
+    if rule_type not in RULE_TYPES:
+        return jsonify({'error': f'Invalid rule_type: {rule_type}'}), 400
+    error = backtest.validate_rule(pattern, rule_count, rule_type, end_marker)
+    if error:
+        return jsonify({'error': error}), 400
+    
+    try:
+        workers = int(os.environ.get('BACKTEST_WORKERS', '0')) or None
+        return jsonify(backtest.backtest(db, item_id, pattern, int(rule_count), workers=workers,
+                                         rule_type=rule_type, end_marker=end_marker))
+    except Exception as e:
+        return jsonify({'error': f'Backtest failed: {str(e)}'}), 500
+
+def history_filters():
+    """Availability history filters from the query string, or an error message"""
+    try:
+        item_id = request.args.get('item_id')
+        return {
+            'item_id': int(item_id) if item_id else None,
+            'since': history.parse_time(request.args.get('since')),
+            'until': history.parse_time(request.args.get('until')),
+            'transitions_only': request.args.get('transitions', '').lower() in ('1', 'true', 'yes'),
+        }, None
+    except ValueError as e:
+        return None, f'Invalid filter: {str(e)}'
+
+@app.route('/api/history', methods=['GET'])
+def get_history():
+    """One page of availability history; pass next_cursor back as `cursor` for the next page"""
+    filters, error = history_filters()
+    if error:
+        return jsonify({'error': error}), 400
+    try:
+        limit = min(max(int(request.args.get('limit', 500)), 1), 5000)
+        cursor = int(request.args['cursor']) if request.args.get('cursor') else None
+    except ValueError:
+        return jsonify({'error': 'limit and cursor must be numbers'}), 400
+    
+    rows = db.get_availability_history(after_id=cursor, limit=limit, **filters)
+    return jsonify({
+        'rows': [history.history_row(row) for row in rows],
+        'next_cursor': rows[-1]['id'] if len(rows) == limit else None,
+    })
+
+@app.route('/api/history/export', methods=['GET'])
+def export_history():
+    """Stream all matching availability history as CSV or NDJSON"""
+    filters, error = history_filters()
+    if error:
+        return jsonify({'error': error}), 400
+    fmt = request.args.get('format', 'csv')
+    if fmt not in history.EXPORT_FORMATS:
+        return jsonify({'error': f'Invalid format: {fmt}'}), 400
+    
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+    return Response(history.export_history(db.iter_availability_history(**filters), fmt), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename=history.{fmt}'})
+
 @app.route('/api/emails', methods=['GET'])
 def get_emails():
     """Get all email addresses"""
@@ -210,10 +426,106 @@ def delete_email(email_id):
 def get_tracker_status():
     """Get tracker status"""
     current_tracker = ensure_tracker()
-    return jsonify({
-        'running': current_tracker.running,
-        'check_interval': current_tracker.check_interval
-    })
+    status = current_tracker.get_status()
+    status['web_startup_ms'] = round(startup_seconds * 1000, 1)
+    return jsonify(status)
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    """Tracker metrics in Prometheus text format"""
+    return Response(render_prometheus(ensure_tracker().get_metrics()),
+                    mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/tracker/domains', methods=['GET'])
+def get_domain_health():
+    """Get per-domain failure stats and circuit breaker state"""
+    return jsonify(ensure_tracker().get_domain_health())
+
+def require_admin(view):
+    """Allow the request only with the ADMIN_TOKEN as a bearer token or X-Admin-Token header"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        admin_token = os.environ.get('ADMIN_TOKEN', '')
+        if not admin_token:
+            return jsonify({'error': 'Admin API disabled: set ADMIN_TOKEN to enable it'}), 403
+        supplied = request.headers.get('X-Admin-Token', '')
+        auth_header = request.headers.get('Authorization', '')
+        if auth_header.startswith('Bearer '):
+            supplied = auth_header[len('Bearer '):]
+        if not hmac.compare_digest(supplied.encode(), admin_token.encode()):
+            return jsonify({'error': 'Unauthorized'}), 401
+        return view(*args, **kwargs)
+    return wrapper
+
+def run_tracker_diagnostic(action, options):
+    """Run a diagnostic where the tracker lives; returns (result, error_response)"""
+    try:
+        return ensure_tracker().run_diagnostic(action, options), None
+    except ProfilerBusy as e:
+        return None, (jsonify({'error': str(e)}), 409)
+    except ValueError as e:
+        return None, (jsonify({'error': str(e)}), 400)
+    except TimeoutError as e:
+        return None, (jsonify({'error': str(e)}), 504)
+    except Exception as e:
+        return None, (jsonify({'error': f'Diagnostic failed: {str(e)}'}), 500)
+
+@app.route('/api/admin/profile', methods=['GET'])
+@require_admin
+def admin_profile():
+    """Time-boxed sampling profile of the tracker threads"""
+    options = {
+        'seconds': request.args.get('seconds', 10, type=float),
+        'interval': request.args.get('interval', 0.005, type=float),
+        'thread_prefix': request.args.get('thread_prefix', '')
+    }
+    profile, error = run_tracker_diagnostic('profile', options)
+    if error:
+        return error
+    if request.args.get('format') == 'folded':
+        filename = f"profile-{datetime.now().strftime('%Y%m%d_%H%M%S')}.folded"
+        return Response(folded_text(profile), mimetype='text/plain',
+                        headers={'Content-Disposition': f'attachment; filename={filename}'})
+    return jsonify(profile)
+
+@app.route('/api/admin/heap', methods=['GET'])
+@require_admin
+def admin_heap_snapshot():
+    """Top allocation sites since tracing was started"""
+    options = {
+        'top': request.args.get('top', 25, type=int),
+        'group_by': request.args.get('group_by', 'lineno')
+    }
+    snapshot, error = run_tracker_diagnostic('heap', options)
+    return error or jsonify(snapshot)
+
+@app.route('/api/admin/heap/start', methods=['POST'])
+@require_admin
+def admin_heap_start():
+    """Start tracemalloc allocation tracing"""
+    data = request.get_json(silent=True) or {}
+    try:
+        if not isinstance(data, dict):
+            raise ValueError('Expected a JSON object')
+        frames = int(data.get('frames', 10))
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': f'Invalid frames: {str(e)}'}), 400
+    status, error = run_tracker_diagnostic('heap_start', {'frames': frames})
+    return error or jsonify(status)
+
+@app.route('/api/admin/heap/stop', methods=['POST'])
+@require_admin
+def admin_heap_stop():
+    """Stop tracemalloc allocation tracing"""
+    status, error = run_tracker_diagnostic('heap_stop', {})
+    return error or jsonify(status)
+
+@app.route('/api/admin/threads', methods=['GET'])
+@require_admin
+def admin_threads():
+    """Dump the stacks of all live threads"""
+    stacks, error = run_tracker_diagnostic('threads', {})
+    return error or jsonify(stacks)
 
 if __name__ == '__main__':
     print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Main block executing, PID: {os.getpid()}")
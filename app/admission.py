@@ -0,0 +1,155 @@
+import threading
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from app.system_stats import available_memory, load_per_cpu, process_tree_rss
+
+MB = 1024 * 1024
+
+
+class AdmissionController:
+    """
+    Decides how many browser checks may run at once from live system pressure.
+
+    MAX_CONCURRENT_CHECKS becomes a ceiling. Below it, the limit is the number
+    of checks in flight plus however many more browsers fit in available
+    memory above reserve_mb, using the measured RSS per running Chrome (or
+    browser_mb before any has started). While the load per CPU is above
+    max_load the limit does not grow.
+
+    Scheduled checks wait (pause) for a free slot and are dropped (shed) when
+    available memory falls below the reserve or no slot frees up in time;
+    the scheduler queues them again on its next pass. A waiting check is
+    handed back to the queue every retry_wait seconds rather than holding a
+    worker, so force checks queued meanwhile go first. Force checks are
+    always admitted up to the ceiling.
+    """
+
+    def __init__(self, max_concurrent: int, enabled: bool = True, reserve_mb: int = 150,
+                 browser_mb: int = 250, max_load: float = 1.5, wait_timeout: float = 30.0,
+                 sample_interval: float = 2.0, retry_wait: float = 0.5):
+        self.max_concurrent = max_concurrent
+        self.enabled = enabled
+        self.reserve_mb = reserve_mb
+        self.browser_mb = browser_mb
+        self.max_load = max_load
+        self.wait_timeout = wait_timeout
+        self.sample_interval = sample_interval
+        self.retry_wait = retry_wait
+        self.condition = threading.Condition()
+        self.in_flight = 0
+        self.limit = max_concurrent
+        self.browsers = 0
+        self.pressure = 'normal'
+        self.available_mb: Optional[float] = None
+        self.load_per_cpu: Optional[float] = None
+        self.browser_rss_mb = 0.0
+        self.paused_checks = 0
+        self.shed_checks = 0
+        self._last_sample = 0.0
+
+    def set_browser_count(self, browsers: int):
+        """Live browser instances, used to work out the memory cost of one"""
+        self.browsers = browsers
+
+    def _sample(self):
+        """Refresh system readings and recompute the limit (called with the lock held)"""
+        now = time.time()
+        if now - self._last_sample < self.sample_interval:
+            return
+        self._last_sample = now
+
+        available = available_memory()
+        self.available_mb = available / MB if available is not None else None
+        self.load_per_cpu = load_per_cpu()
+        self.browser_rss_mb = process_tree_rss(name_filter='chrom') / MB
+
+        per_browser_mb = self.browser_mb
+        if self.browsers and self.browser_rss_mb:
+            per_browser_mb = max(self.browser_rss_mb / self.browsers, 1)
+
+        limit = self.max_concurrent
+        pressure = 'normal'
+        if self.available_mb is not None:
+            headroom = int((self.available_mb - self.reserve_mb) // per_browser_mb)
+            limit = min(limit, self.in_flight + max(headroom, 0))
+            if self.available_mb < self.reserve_mb:
+                pressure = 'critical'
+            elif headroom < 1:
+                pressure = 'memory'
+        if self.load_per_cpu is not None and self.load_per_cpu >= self.max_load:
+            limit = min(limit, max(self.in_flight, 1))
+            if pressure == 'normal':
+                pressure = 'cpu'
+
+        limit = max(1, limit)
+        if limit != self.limit or pressure != self.pressure:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Admission limit {self.limit} -> {limit} "
+                  f"(pressure: {pressure}, available: {self.available_mb or 0:.0f} MB, "
+                  f"load/cpu: {self.load_per_cpu or 0:.2f})")
+        self.limit = limit
+        self.pressure = pressure
+
+    def acquire(self, force: bool = False, waiting_since: float = None) -> Optional[bool]:
+        """
+        Get a check slot, waiting at most retry_wait seconds.
+        
+        True: admitted. False: the (scheduled) check was shed. None: no slot
+        yet; queue the check again and retry, passing when it started waiting.
+        """
+        with self.condition:
+            if not self.enabled or force:
+                self.in_flight += 1
+                return True
+
+            now = time.time()
+            first_attempt = waiting_since is None
+            if first_attempt:
+                waiting_since = now
+            deadline = min(waiting_since + self.wait_timeout, now + self.retry_wait)
+            while True:
+                self._sample()
+                if self.pressure == 'critical':
+                    self.shed_checks += 1
+                    return False
+                if self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return True
+                remaining = deadline - time.time()
+                if remaining > 0:
+                    self.condition.wait(min(remaining, self.sample_interval))
+                    continue
+                if time.time() - waiting_since >= self.wait_timeout:
+                    self.shed_checks += 1
+                    return False
+                if first_attempt:
+                    self.paused_checks += 1
+                return None
+
+    def release(self):
+        with self.condition:
+            self.in_flight -= 1
+            self.condition.notify()
+
+    def idle_browsers_to_close(self) -> int:
+        """How many idle browsers to close to get back under the current limit"""
+        with self.condition:
+            if not self.enabled or self.pressure not in ('critical', 'memory'):
+                return 0
+            return max(0, self.browsers - max(self.limit, self.in_flight))
+
+    def get_status(self) -> Dict:
+        with self.condition:
+            return {
+                'enabled': self.enabled,
+                'limit': self.limit,
+                'max_concurrent': self.max_concurrent,
+                'in_flight': self.in_flight,
+                'pressure': self.pressure,
+                'available_mb': round(self.available_mb, 1) if self.available_mb is not None else None,
+                'load_per_cpu': round(self.load_per_cpu, 2) if self.load_per_cpu is not None else None,
+                'browser_rss_mb': round(self.browser_rss_mb, 1),
+                'paused_checks': self.paused_checks,
+                'shed_checks': self.shed_checks,
+            }
@@ -0,0 +1,186 @@
+import atexit
+import multiprocessing
+import os
+import re
+import threading
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from app.models import Database
+from app.rules import evaluate_rule, truncate_at_marker
+from app.structured_data import extract_availability
+
+# Below this many snapshots the work is done inline; starting pool workers costs more
+MIN_PARALLEL_SNAPSHOTS = 8
+
+_pool = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def validate_rule(pattern: str, expected_count, rule_type: str = 'regex',
+                  end_marker: Optional[str] = None) -> Optional[str]:
+    """Error message for an unusable rule, None if it can be evaluated"""
+    if end_marker is not None and not isinstance(end_marker, str):
+        return "end_marker must be a string"
+    try:
+        if int(expected_count) < 1:
+            return "Rule count must be at least 1"
+    except (TypeError, ValueError):
+        return "Rule count must be a number"
+    if rule_type == 'structured':
+        return None
+    if not isinstance(pattern, str):
+        return "Rule pattern must be a string"
+    try:
+        re.compile(pattern, re.IGNORECASE)
+    except re.error as e:
+        return f"Invalid rule pattern: {str(e)}"
+    return None
+
+
+def format_utc(timestamp: float) -> str:
+    """Epoch seconds in UTC, formatted like the other endpoints' times"""
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def sample_matches(page_source: str, pattern: str, limit: int = 5, context: int = 40) -> List[str]:
+    """First few matches with some surrounding text, to see what a pattern actually hits"""
+    samples = []
+    for match in re.finditer(pattern, page_source, re.IGNORECASE):
+        start = max(match.start() - context, 0)
+        samples.append(page_source[start:match.end() + context])
+        if len(samples) >= limit:
+            break
+    return samples
+
+
+def _evaluate(page_source: str, rule_type: str, pattern: str, expected_count: int,
+              end_marker: Optional[str] = None) -> Tuple[Optional[bool], Optional[int]]:
+    """(is_available, match_count); structured rules have no match count and may find nothing (None)"""
+    page_source = truncate_at_marker(page_source, end_marker)
+    if rule_type == 'structured':
+        found = extract_availability(page_source)
+        return (found['is_available'] if found else None), None
+    return evaluate_rule(page_source, pattern, expected_count)
+
+
+def dry_run(db: Database, item_id: int, pattern: str, expected_count: int,
+            rule_type: str = 'regex', end_marker: Optional[str] = None) -> Optional[Dict]:
+    """Evaluate a rule against the item's latest stored page; None if there is no snapshot yet"""
+    snapshot = db.get_latest_page_snapshot(item_id)
+    if not snapshot:
+        return None
+
+    page_source = truncate_at_marker(snapshot['page_source'], end_marker)
+    is_available, match_count = _evaluate(page_source, rule_type, pattern, expected_count)
+    return {
+        'item_id': item_id,
+        'snapshot_id': snapshot['id'],
+        'captured_at': format_utc(snapshot['captured_at']),
+        'page_size': snapshot['size'],
+        'is_available': is_available,
+        'match_count': match_count,
+        'recorded_available': bool(snapshot['is_available']),
+        'matches': sample_matches(page_source, pattern) if rule_type == 'regex' else [],
+        'structured_data': extract_availability(page_source),
+    }
+
+
+def _evaluate_chunk(contents: List[bytes], rule_type: str, pattern: str, expected_count: int,
+                    end_marker: Optional[str] = None) -> List[Tuple[Optional[bool], Optional[int]]]:
+    """Runs in a pool worker: decompress and evaluate a batch of snapshots"""
+    return [_evaluate(zlib.decompress(content).decode('utf-8'), rule_type, pattern, expected_count, end_marker)
+            for content in contents]
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False)
+            # forkserver children are forked from a clean server process, not from
+            # the threaded web/tracker process
+            method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(method))
+            _pool_workers = workers
+        return _pool
+
+
+def shutdown_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown_pool)
+
+
+def backtest(db: Database, item_id: int, pattern: str, expected_count: int, workers: int = None,
+             rule_type: str = 'regex', end_marker: Optional[str] = None) -> Dict:
+    """
+    Re-run a rule over every archived snapshot of an item.
+
+    Snapshots are split into one batch per worker and evaluated in a process
+    pool, so long regexes over large pages use every CPU without holding the
+    web process's GIL. Transitions are changes between consecutive snapshots;
+    the ones the stored checks recorded are compared with the ones the
+    candidate rule would have produced. Snapshots a structured rule can't
+    decide are reported but left out of the comparison.
+    """
+    workers = workers or os.cpu_count() or 1
+    snapshots = db.get_archived_page_snapshots(item_id)
+    contents = [snapshot.pop('content') for snapshot in snapshots]
+
+    if workers > 1 and len(contents) >= MIN_PARALLEL_SNAPSHOTS:
+        pool = _get_pool(workers)
+        chunk_size = -(-len(contents) // workers)
+        futures = [pool.submit(_evaluate_chunk, contents[start:start + chunk_size], rule_type, pattern,
+                               expected_count, end_marker)
+                   for start in range(0, len(contents), chunk_size)]
+        results = [result for future in futures for result in future.result()]
+    else:
+        results = _evaluate_chunk(contents, rule_type, pattern, expected_count, end_marker)
+
+    evaluated = []
+    detected, missed, extra = [], [], []
+    previous = None
+    for snapshot, (is_available, match_count) in zip(snapshots, results):
+        entry = {
+            'snapshot_id': snapshot['id'],
+            'captured_at': format_utc(snapshot['captured_at']),
+            'recorded_available': bool(snapshot['is_available']),
+            'is_available': is_available,
+            'match_count': match_count,
+        }
+        evaluated.append(entry)
+        if is_available is None:
+            continue
+        if previous is not None:
+            recorded_change = entry['recorded_available'] != previous['recorded_available']
+            candidate_change = entry['is_available'] != previous['is_available']
+            transition = {'captured_at': entry['captured_at'], 'snapshot_id': entry['snapshot_id'],
+                          'became_available': entry['recorded_available'] if recorded_change else is_available}
+            if recorded_change and candidate_change and entry['is_available'] == entry['recorded_available']:
+                detected.append(transition)
+            elif recorded_change:
+                missed.append(transition)
+            elif candidate_change:
+                extra.append(transition)
+        previous = entry
+
+    return {
+        'item_id': item_id,
+        'snapshots': len(evaluated),
+        'agreement': sum(1 for entry in evaluated if entry['is_available'] == entry['recorded_available']),
+        'undetermined': sum(1 for entry in evaluated if entry['is_available'] is None),
+        'detected_transitions': detected,
+        'missed_transitions': missed,
+        'extra_transitions': extra,
+        'results': evaluated,
+    }
@@ -0,0 +1,145 @@
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+
+class DomainCircuit:
+    """Failure statistics and breaker state for a single domain"""
+
+    def __init__(self, domain: str):
+        self.domain = domain
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.total_checks = 0
+        self.total_failures = 0
+        self.skipped_checks = 0
+        self.backoff = 0
+        self.open_until = 0.0
+        self.probe_in_flight = False
+        self.last_error = None
+        self.last_failure_at = None
+        self.last_success_at = None
+
+    def to_dict(self) -> Dict:
+        return {
+            'domain': self.domain,
+            'state': self.state,
+            'consecutive_failures': self.consecutive_failures,
+            'total_checks': self.total_checks,
+            'total_failures': self.total_failures,
+            'skipped_checks': self.skipped_checks,
+            'backoff_seconds': self.backoff,
+            'retry_in_seconds': max(0, round(self.open_until - time.time())) if self.state == OPEN else 0,
+            'last_error': self.last_error,
+            'last_failure_at': self.last_failure_at,
+            'last_success_at': self.last_success_at,
+        }
+
+
+class DomainHealth:
+    """
+    Per-domain circuit breaker for browser checks.
+
+    After failure_threshold consecutive failures a domain is opened and its
+    checks are skipped for base_backoff seconds. Once the backoff expires a
+    single half-open probe is let through: success closes the circuit,
+    failure re-opens it with the backoff doubled (up to max_backoff).
+    """
+
+    def __init__(self, failure_threshold: int = 3, base_backoff: int = 60, max_backoff: int = 3600):
+        self.failure_threshold = failure_threshold
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.circuits: Dict[str, DomainCircuit] = {}
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def domain_of(url: str) -> str:
+        host = (urlparse(url).hostname or '').lower()
+        return host[4:] if host.startswith('www.') else host
+
+    def _circuit(self, url: str) -> DomainCircuit:
+        domain = self.domain_of(url)
+        circuit = self.circuits.get(domain)
+        if circuit is None:
+            circuit = self.circuits[domain] = DomainCircuit(domain)
+        return circuit
+
+    def is_open(self, url: str) -> bool:
+        """Whether checks of this domain are currently being skipped (no state change)"""
+        with self.lock:
+            circuit = self.circuits.get(self.domain_of(url))
+            if circuit is None:
+                return False
+            if circuit.state == OPEN:
+                return time.time() < circuit.open_until
+            return circuit.state == HALF_OPEN and circuit.probe_in_flight
+
+    def allow_request(self, url: str) -> bool:
+        """Decide whether a check may run now; half-opens expired circuits"""
+        with self.lock:
+            circuit = self._circuit(url)
+            if circuit.state == OPEN and time.time() >= circuit.open_until:
+                circuit.state = HALF_OPEN
+                circuit.probe_in_flight = False
+            if circuit.state == CLOSED:
+                return True
+            if circuit.state == HALF_OPEN and not circuit.probe_in_flight:
+                circuit.probe_in_flight = True
+                return True
+            circuit.skipped_checks += 1
+            return False
+
+    def release_probe(self, url: str):
+        """
+        End a check that says nothing about the site (local or item error):
+        the half-open probe slot is freed without changing the circuit.
+        """
+        with self.lock:
+            circuit = self.circuits.get(self.domain_of(url))
+            if circuit is not None:
+                circuit.probe_in_flight = False
+
+    def record_success(self, url: str):
+        with self.lock:
+            circuit = self._circuit(url)
+            circuit.total_checks += 1
+            circuit.last_success_at = datetime.now().isoformat()
+            if circuit.state != CLOSED:
+                print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Circuit closed for {circuit.domain}")
+            circuit.state = CLOSED
+            circuit.consecutive_failures = 0
+            circuit.backoff = 0
+            circuit.probe_in_flight = False
+
+    def record_failure(self, url: str, error: Optional[str] = None):
+        with self.lock:
+            circuit = self._circuit(url)
+            circuit.total_checks += 1
+            circuit.total_failures += 1
+            circuit.consecutive_failures += 1
+            circuit.last_error = error
+            circuit.last_failure_at = datetime.now().isoformat()
+
+            if circuit.state == HALF_OPEN:
+                circuit.backoff = min(circuit.backoff * 2, self.max_backoff)
+            elif circuit.state == CLOSED and circuit.consecutive_failures >= self.failure_threshold:
+                circuit.backoff = self.base_backoff
+            else:
+                return
+
+            circuit.state = OPEN
+            circuit.probe_in_flight = False
+            circuit.open_until = time.time() + circuit.backoff
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Circuit opened for {circuit.domain} "
+                  f"after {circuit.consecutive_failures} failures, retrying in {circuit.backoff}s")
+
+    def get_status(self) -> List[Dict]:
+        with self.lock:
+            return [circuit.to_dict() for circuit in sorted(self.circuits.values(), key=lambda c: c.domain)]
@@ -0,0 +1,46 @@
+import csv
+import io
+import json
+from datetime import datetime, timezone
+from typing import Dict, Iterable, Iterator, Optional
+
+HISTORY_FIELDS = ('id', 'item_id', 'checked_at', 'is_available')
+EXPORT_FORMATS = ('csv', 'ndjson')
+
+
+def parse_time(value: Optional[str]) -> Optional[str]:
+    """
+    An ISO 8601 time as availability_history stores it (UTC, to the second).
+
+    Times without a timezone are taken as UTC. Raises ValueError for
+    anything else.
+    """
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc)
+    return parsed.strftime('%Y-%m-%d %H:%M:%S')
+
+
+def history_row(row: Dict) -> Dict:
+    return {'id': row['id'], 'item_id': row['item_id'], 'checked_at': row['checked_at'],
+            'is_available': bool(row['is_available'])}
+
+
+def export_history(rows: Iterable[Dict], fmt: str) -> Iterator[str]:
+    """Serialise history rows one at a time, for a streamed response"""
+    if fmt == 'ndjson':
+        for row in rows:
+            yield json.dumps(history_row(row)) + '\n'
+        return
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(HISTORY_FIELDS)
+    for row in rows:
+        writer.writerow([row['id'], row['item_id'], row['checked_at'], int(row['is_available'])])
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
@@ -0,0 +1,62 @@
+import csv
+import io
+import json
+from typing import Dict, Iterable, Iterator, List
+
+# Columns of an export, in order; an export can be imported again as is
+ITEM_FIELDS = ('name', 'url', 'rule_type', 'rule_pattern', 'rule_count', 'fetch_mode', 'end_marker')
+IMPORT_FORMATS = ('json', 'csv')
+
+
+def parse_items(body: str, fmt: str) -> List[Dict]:
+    """
+    Item dicts from an uploaded CSV or JSON document.
+
+    JSON is a list of items or {"items": [...]}; CSV has a header row naming
+    the columns. Empty CSV cells are left out so field defaults apply.
+    Raises ValueError for a document that can't be read.
+    """
+    if fmt == 'csv':
+        try:
+            return [{key: value for key, value in row.items() if key and value not in (None, '')}
+                    for row in csv.DictReader(io.StringIO(body))]
+        except csv.Error as e:
+            raise ValueError(f'Invalid CSV: {str(e)}')
+
+    try:
+        data = json.loads(body)
+    except ValueError as e:
+        raise ValueError(f'Invalid JSON: {str(e)}')
+    if isinstance(data, dict):
+        data = data.get('items')
+    if not isinstance(data, list) or not all(isinstance(item, dict) for item in data):
+        raise ValueError('Expected a list of items or {"items": [...]}')
+    return data
+
+
+def first_check_times(count: int, spread: float, now: float) -> List[float]:
+    """Evenly spaced first check times over `spread` seconds, starting now"""
+    spacing = spread / count if count else 0
+    return [now + position * spacing for position in range(count)]
+
+
+def export_items(items: Iterable[Dict], fmt: str) -> Iterator[str]:
+    """Serialise items one at a time, for a streamed response"""
+    if fmt == 'csv':
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=ITEM_FIELDS, extrasaction='ignore')
+        writer.writeheader()
+        for item in items:
+            writer.writerow(item)
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+        return
+
+    yield '['
+    separator = ''
+    for item in items:
+        yield separator + json.dumps({field: item[field] for field in ITEM_FIELDS})
+        separator = ',\n'
+    yield ']\n'
@@ -0,0 +1,179 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Tuple
+
+# Latency buckets in seconds, from fast regex runs up to full page-load timeouts
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+HELP = {
+    'stock_tracker_stage_seconds': 'Time spent in each stage of an item check',
+    'stock_tracker_check_seconds': 'Total check latency per domain and fetch mode',
+    'stock_tracker_checks_total': 'Item checks by domain and result',
+    'stock_tracker_queue_depth': 'Tasks waiting in the check queue',
+    'stock_tracker_processing_items': 'Items currently being checked',
+    'stock_tracker_browsers': 'Browser instances by state',
+    'stock_tracker_pool_utilization': 'Fraction of the browser pool in use',
+    'stock_tracker_admission_limit': 'Browser checks currently allowed to run at once',
+}
+
+
+def _label_key(labels: Dict) -> Tuple:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+class Metrics:
+    """
+    In-process counters, gauges and histograms.
+
+    Everything is kept in plain dicts keyed by (name, labels) under one lock,
+    so recording a value costs a dict lookup. Gauges that describe current
+    state (queue depth, pool usage) are filled in by collectors at snapshot
+    time instead of being updated on every change.
+    """
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counters: Dict[Tuple, float] = {}
+        self.gauges: Dict[Tuple, float] = {}
+        self.histograms: Dict[Tuple, List] = {}
+        self.collectors: List[Callable[['Metrics'], None]] = []
+        self.lock = threading.Lock()
+
+    def inc(self, name: str, value: float = 1, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def set_gauge(self, name: str, value: float, **labels):
+        with self.lock:
+            self.gauges[(name, _label_key(labels))] = value
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, _label_key(labels))
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                # [per-bucket counts (+Inf last), sum, count]
+                histogram = self.histograms[key] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            histogram[0][bisect_left(self.buckets, value)] += 1
+            histogram[1] += value
+            histogram[2] += 1
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        """Observe the duration of the with-block in seconds"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - started, **labels)
+
+    def register_collector(self, collector: Callable[['Metrics'], None]):
+        """Register a callback that sets gauges just before each snapshot"""
+        self.collectors.append(collector)
+
+    def snapshot(self) -> Dict:
+        """JSON-serialisable copy of all metrics"""
+        for collector in self.collectors:
+            try:
+                collector(self)
+            except Exception as e:
+                print(f"Error collecting metrics: {str(e)}")
+
+        with self.lock:
+            histograms = []
+            for (name, labels), (counts, total, count) in self.histograms.items():
+                cumulative = 0
+                buckets = []
+                for bound, bucket_count in zip(list(self.buckets) + ['+Inf'], counts):
+                    cumulative += bucket_count
+                    buckets.append([bound, cumulative])
+                histograms.append({'name': name, 'labels': dict(labels), 'buckets': buckets,
+                                   'sum': round(total, 6), 'count': count})
+            return {
+                'counters': [{'name': name, 'labels': dict(labels), 'value': value}
+                             for (name, labels), value in self.counters.items()],
+                'gauges': [{'name': name, 'labels': dict(labels), 'value': value}
+                           for (name, labels), value in self.gauges.items()],
+                'histograms': histograms,
+            }
+
+
+def histogram_quantile(histogram: Dict, quantile: float) -> float:
+    """Estimate a quantile from cumulative buckets (upper bound of the bucket it falls in)"""
+    if not histogram['count']:
+        return 0.0
+    rank = quantile * histogram['count']
+    previous_bound = 0.0
+    for bound, cumulative in histogram['buckets']:
+        if cumulative >= rank:
+            return previous_bound if bound == '+Inf' else bound
+        previous_bound = bound
+    return previous_bound
+
+
+def summarize_stages(snapshot: Dict) -> Dict:
+    """Per-stage count, mean and estimated p50/p99 for the status API"""
+    summary = {}
+    for histogram in snapshot['histograms']:
+        if histogram['name'] != 'stock_tracker_stage_seconds':
+            continue
+        count = histogram['count']
+        summary[histogram['labels']['stage']] = {
+            'count': count,
+            'mean_seconds': round(histogram['sum'] / count, 4) if count else 0.0,
+            'p50_seconds': histogram_quantile(histogram, 0.5),
+            'p99_seconds': histogram_quantile(histogram, 0.99),
+        }
+    return summary
+
+
+def _format_labels(labels: Dict) -> str:
+    if not labels:
+        return ''
+    parts = []
+    for key, value in sorted(labels.items()):
+        value = str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def render_prometheus(snapshots: List[Tuple[Dict, Dict]]) -> str:
+    """
+    Render metric snapshots in the Prometheus text exposition format.
+
+    Takes (extra_labels, snapshot) pairs so the web app can merge snapshots
+    published by several workers, labelling each with its node.
+    """
+    families: Dict[str, Tuple[str, List[str]]] = {}
+
+    def family(name: str, metric_type: str) -> List[str]:
+        if name not in families:
+            families[name] = (metric_type, [])
+        return families[name][1]
+
+    for extra_labels, snapshot in snapshots:
+        for counter in snapshot.get('counters', []):
+            labels = {**counter['labels'], **extra_labels}
+            family(counter['name'], 'counter').append(f"{counter['name']}{_format_labels(labels)} {counter['value']}")
+        for gauge in snapshot.get('gauges', []):
+            labels = {**gauge['labels'], **extra_labels}
+            family(gauge['name'], 'gauge').append(f"{gauge['name']}{_format_labels(labels)} {gauge['value']}")
+        for histogram in snapshot.get('histograms', []):
+            name = histogram['name']
+            labels = {**histogram['labels'], **extra_labels}
+            lines = family(name, 'histogram')
+            for bound, cumulative in histogram['buckets']:
+                lines.append(f"{name}_bucket{_format_labels({**labels, 'le': bound})} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {histogram['sum']}")
+            lines.append(f"{name}_count{_format_labels(labels)} {histogram['count']}")
+
+    output = []
+    for name, (metric_type, lines) in sorted(families.items()):
+        if name in HELP:
+            output.append(f"# HELP {name} {HELP[name]}")
+        output.append(f"# TYPE {name} {metric_type}")
+        output.extend(lines)
+    return '\n'.join(output) + '\n'
@@ -1,7 +1,9 @@
 import sqlite3
+import time
+import zlib
 from datetime import datetime
 import json
-from typing import List, Dict, Optional
+from typing import Iterator, List, Dict, Optional
 from contextlib import contextmanager
 
 class Database:
@@ -11,7 +13,8 @@ class Database:
     
     @contextmanager
     def get_connection(self):
-        conn = sqlite3.connect(self.db_path)
+        # Several tracker nodes may share this file, so wait for locks instead of failing
+        conn = sqlite3.connect(self.db_path, timeout=30)
         conn.row_factory = sqlite3.Row
         try:
             yield conn
@@ -22,6 +25,9 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
+            # WAL lets readers proceed while a node holds the write lock
+            cursor.execute('PRAGMA journal_mode=WAL')
+            
             # Items table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS items (
@@ -30,6 +36,9 @@ class Database:
                     name TEXT NOT NULL,
                     rule_pattern TEXT NOT NULL,
                     rule_count INTEGER NOT NULL,
+                    rule_type TEXT NOT NULL DEFAULT 'regex',
+                    fetch_mode TEXT NOT NULL DEFAULT 'browser',
+                    end_marker TEXT,
                     is_available BOOLEAN DEFAULT NULL,
                     last_checked TIMESTAMP,
                     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
@@ -37,6 +46,11 @@ class Database:
                 )
             ''')
             
+            # Columns added after the first release
+            self._add_column(cursor, 'items', 'rule_type', "TEXT NOT NULL DEFAULT 'regex'")
+            self._add_column(cursor, 'items', 'fetch_mode', "TEXT NOT NULL DEFAULT 'browser'")
+            self._add_column(cursor, 'items', 'end_marker', 'TEXT')
+            
             # Email addresses table
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS emails (
@@ -58,32 +72,145 @@ class Database:
                 )
             ''')
             
+            # Tracker nodes participating in distributed mode
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS tracker_nodes (
+                    node_id TEXT PRIMARY KEY,
+                    hostname TEXT,
+                    pid INTEGER,
+                    started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    last_heartbeat REAL NOT NULL
+                )
+            ''')
+            
+            # Expiring claims of items by tracker nodes
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS item_leases (
+                    item_id INTEGER PRIMARY KEY,
+                    node_id TEXT NOT NULL,
+                    expires_at REAL NOT NULL,
+                    FOREIGN KEY (item_id) REFERENCES items(id) ON DELETE CASCADE
+                )
+            ''')
+            
+            # Control channel between the web app and headless tracker workers
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS tracker_commands (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    command TEXT NOT NULL,
+                    item_id INTEGER,
+                    payload TEXT,
+                    status TEXT NOT NULL DEFAULT 'pending',
+                    node_id TEXT,
+                    result TEXT,
+                    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                    completed_at TIMESTAMP
+                )
+            ''')
+            
+            # Latest status snapshot published by each tracker worker
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS tracker_status (
+                    node_id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    updated_at REAL NOT NULL
+                )
+            ''')
+            
+            # When each item was last checked and is next due, so a restarted tracker
+            # resumes its schedule instead of checking everything at once
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS scheduler_state (
+                    item_id INTEGER PRIMARY KEY,
+                    last_check_at REAL,
+                    next_due_at REAL,
+                    force_pending BOOLEAN NOT NULL DEFAULT 0
+                )
+            ''')
+            
+            # zlib-compressed page sources: the latest check of each item (archived = 0)
+            # plus archived copies used to backtest rules
+            cursor.execute('''
+                CREATE TABLE IF NOT EXISTS page_snapshots (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    item_id INTEGER NOT NULL,
+                    captured_at REAL NOT NULL,
+                    is_available BOOLEAN NOT NULL,
+                    archived BOOLEAN NOT NULL DEFAULT 0,
+                    size INTEGER NOT NULL,
+                    content BLOB NOT NULL
+                )
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_page_snapshots_item
+                ON page_snapshots (item_id, archived, captured_at)
+            ''')
+            cursor.execute('''
+                CREATE INDEX IF NOT EXISTS idx_availability_history_item
+                ON availability_history (item_id, checked_at)
+            ''')
+            
             conn.commit()
     
-    def add_item(self, url: str, name: str, rule_pattern: str, rule_count: int) -> int:
+    def _add_column(self, cursor, table: str, column: str, definition: str):
+        """Add a column to an existing database if it predates it"""
+        cursor.execute(f'PRAGMA table_info({table})')
+        if column not in [row['name'] for row in cursor.fetchall()]:
+            cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+    
+    def add_item(self, url: str, name: str, rule_pattern: str, rule_count: int,
+                 rule_type: str = 'regex', fetch_mode: str = 'browser', end_marker: str = None) -> int:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
-                INSERT INTO items (url, name, rule_pattern, rule_count)
-                VALUES (?, ?, ?, ?)
-            ''', (url, name, rule_pattern, rule_count))
+                INSERT INTO items (url, name, rule_pattern, rule_count, rule_type, fetch_mode, end_marker)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', (url, name, rule_pattern, rule_count, rule_type, fetch_mode, end_marker))
             conn.commit()
             return cursor.lastrowid
     
-    def update_item(self, item_id: int, url: str, name: str, rule_pattern: str, rule_count: int):
+    def add_items(self, items: List[Dict], first_checks: List[float]) -> List[int]:
+        """
+        Insert many items in one transaction.
+
+        Each item gets a scheduler_state row due at its entry in first_checks,
+        so trackers check it then at normal priority instead of straight away.
+        """
+        item_ids = []
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            for item, first_check in zip(items, first_checks):
+                cursor.execute('''
+                    INSERT INTO items (url, name, rule_pattern, rule_count, rule_type, fetch_mode, end_marker)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                ''', (item['url'], item['name'], item['rule_pattern'], item['rule_count'],
+                      item['rule_type'], item['fetch_mode'], item['end_marker']))
+                item_ids.append(cursor.lastrowid)
+            cursor.executemany('''
+                INSERT INTO scheduler_state (item_id, next_due_at) VALUES (?, ?)
+            ''', list(zip(item_ids, first_checks)))
+            conn.commit()
+        return item_ids
+    
+    def update_item(self, item_id: int, url: str, name: str, rule_pattern: str, rule_count: int,
+                    rule_type: str = 'regex', fetch_mode: str = 'browser', end_marker: str = None):
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('''
                 UPDATE items
-                SET url = ?, name = ?, rule_pattern = ?, rule_count = ?, updated_at = CURRENT_TIMESTAMP
+                SET url = ?, name = ?, rule_pattern = ?, rule_count = ?, rule_type = ?, fetch_mode = ?,
+                    end_marker = ?, updated_at = CURRENT_TIMESTAMP
                 WHERE id = ?
-            ''', (url, name, rule_pattern, rule_count, item_id))
+            ''', (url, name, rule_pattern, rule_count, rule_type, fetch_mode, end_marker, item_id))
             conn.commit()
     
     def delete_item(self, item_id: int):
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('DELETE FROM items WHERE id = ?', (item_id,))
+            cursor.execute('DELETE FROM item_leases WHERE item_id = ?', (item_id,))
+            cursor.execute('DELETE FROM page_snapshots WHERE item_id = ?', (item_id,))
+            cursor.execute('DELETE FROM scheduler_state WHERE item_id = ?', (item_id,))
             conn.commit()
     
     def get_all_items(self) -> List[Dict]:
@@ -92,6 +219,21 @@ class Database:
             cursor.execute('SELECT * FROM items ORDER BY created_at DESC')
             return [dict(row) for row in cursor.fetchall()]
     
+    def iter_items(self) -> Iterator[Dict]:
+        """All items, oldest first, read from the cursor one row at a time"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM items ORDER BY id')
+            for row in cursor:
+                yield dict(row)
+    
+    def get_item(self, item_id: int) -> Optional[Dict]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM items WHERE id = ?', (item_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+    
     def update_item_availability(self, item_id: int, is_available: bool):
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -125,6 +267,211 @@ class Database:
                 return results[0]['is_available'] != results[1]['is_available']
             return None
     
+    def get_availability_transitions(self, since: float):
+        """
+        Availability changes of every item since a time, for rebuilding timelines.
+
+        Returns (transitions, last check time per item id, highest history id).
+        The first row of each item in the period is included as its starting state.
+        """
+        since = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(since))
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT MAX(id) AS last_id FROM availability_history')
+            last_id = cursor.fetchone()['last_id'] or 0
+            cursor.execute('''
+                SELECT item_id, is_available, checked_at FROM (
+                    SELECT h.item_id, h.is_available, h.checked_at,
+                           LAG(h.is_available) OVER (PARTITION BY h.item_id ORDER BY h.checked_at, h.id) AS previous
+                    FROM availability_history h
+                    JOIN items i ON i.id = h.item_id
+                    WHERE h.checked_at >= ? AND h.id <= ?
+                )
+                WHERE previous IS NULL OR previous != is_available
+                ORDER BY item_id, checked_at
+            ''', (since, last_id))
+            transitions = [dict(row) for row in cursor.fetchall()]
+            cursor.execute('''
+                SELECT h.item_id, MAX(h.checked_at) AS checked_at
+                FROM availability_history h
+                JOIN items i ON i.id = h.item_id
+                WHERE h.checked_at >= ? AND h.id <= ?
+                GROUP BY h.item_id
+            ''', (since, last_id))
+            last_checks = {row['item_id']: row['checked_at'] for row in cursor.fetchall()}
+            return transitions, last_checks, last_id
+    
+    def get_availability_history_after(self, history_id: int, limit: int = 10000) -> List[Dict]:
+        """History rows recorded after a given id, oldest first"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, item_id, is_available, checked_at FROM availability_history
+                WHERE id > ?
+                ORDER BY id
+                LIMIT ?
+            ''', (history_id, limit))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def get_availability_history(self, item_id: int = None, since: str = None, until: str = None,
+                                 transitions_only: bool = False, after_id: int = None,
+                                 limit: int = 500) -> List[Dict]:
+        """
+        One page of availability history ordered by (item_id, checked_at, id).
+        
+        Pages are keyset-paginated: pass the id of the last row of the previous
+        page as after_id. since/until are UTC 'YYYY-MM-DD HH:MM:SS' bounds
+        (until exclusive). With transitions_only, only rows whose state differs
+        from the item's previous check are returned (an item's first check
+        counts as one); the previous check is looked up through the index even
+        when it falls before `since`.
+        """
+        conditions, params = [], []
+        if item_id is not None:
+            conditions.append('h.item_id = ?')
+            params.append(item_id)
+        if since:
+            conditions.append('h.checked_at >= ?')
+            params.append(since)
+        if until:
+            conditions.append('h.checked_at < ?')
+            params.append(until)
+        if after_id is not None:
+            conditions.append('''(h.item_id, h.checked_at, h.id) >
+                (SELECT item_id, checked_at, id FROM availability_history WHERE id = ?)''')
+            params.append(after_id)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        
+        query = f'''
+            SELECT h.id, h.item_id, h.checked_at, h.is_available FROM availability_history h
+            {where}
+            ORDER BY h.item_id, h.checked_at, h.id
+        '''
+        if transitions_only:
+            query = f'''
+                SELECT id, item_id, checked_at, is_available FROM (
+                    SELECT h.id, h.item_id, h.checked_at, h.is_available,
+                           (SELECT p.is_available FROM availability_history p
+                            WHERE p.item_id = h.item_id AND (p.checked_at, p.id) < (h.checked_at, h.id)
+                            ORDER BY p.checked_at DESC, p.id DESC LIMIT 1) AS previous
+                    FROM availability_history h
+                    {where}
+                    ORDER BY h.item_id, h.checked_at, h.id
+                )
+                WHERE previous IS NULL OR previous != is_available
+            '''
+        
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'{query} LIMIT ?', (*params, limit))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def iter_availability_history(self, batch_size: int = 1000, **filters) -> Iterator[Dict]:
+        """
+        Every matching history row, one at a time, for exports.
+        
+        Rows are read in keyset-paginated batches, each in its own short read,
+        so an export of any size holds neither the whole result in memory nor
+        one read transaction open for its whole duration.
+        """
+        after_id = None
+        while True:
+            rows = self.get_availability_history(after_id=after_id, limit=batch_size, **filters)
+            yield from rows
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1]['id']
+    
+    def get_scheduler_state(self) -> Dict[int, Dict]:
+        """Persisted schedule of every item, keyed by item id"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM scheduler_state')
+            return {row['item_id']: dict(row) for row in cursor.fetchall()}
+    
+    def record_item_check(self, item_id: int, checked_at: float, next_due_at: float, force: bool = False):
+        """Save when an item was checked and is next due; a force check clears its pending flag"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO scheduler_state (item_id, last_check_at, next_due_at, force_pending)
+                VALUES (?, ?, ?, 0)
+                ON CONFLICT (item_id) DO UPDATE SET
+                    last_check_at = excluded.last_check_at,
+                    next_due_at = excluded.next_due_at,
+                    force_pending = CASE WHEN ? THEN 0 ELSE force_pending END
+            ''', (item_id, checked_at, next_due_at, force))
+            conn.commit()
+    
+    def set_force_pending(self, item_id: int):
+        """Remember a queued force check so it survives a restart"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO scheduler_state (item_id, force_pending)
+                VALUES (?, 1)
+                ON CONFLICT (item_id) DO UPDATE SET force_pending = 1
+            ''', (item_id,))
+            conn.commit()
+    
+    def save_page_snapshot(self, item_id: int, page_source: str, is_available: bool,
+                           archive: bool = False, keep: int = 50):
+        """
+        Store the page source of an item's latest check.
+        
+        Only one unarchived snapshot is kept per item and it is replaced on
+        every check. With archive=True the snapshot is kept for backtesting
+        instead, and archived snapshots beyond the newest keep are deleted.
+        """
+        data = page_source.encode('utf-8')
+        content = zlib.compress(data, 6)
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM page_snapshots WHERE item_id = ? AND archived = 0', (item_id,))
+            cursor.execute('''
+                INSERT INTO page_snapshots (item_id, captured_at, is_available, archived, size, content)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (item_id, time.time(), is_available, archive, len(data), content))
+            if archive:
+                cursor.execute('''
+                    DELETE FROM page_snapshots
+                    WHERE item_id = ? AND archived = 1 AND id NOT IN (
+                        SELECT id FROM page_snapshots
+                        WHERE item_id = ? AND archived = 1
+                        ORDER BY captured_at DESC
+                        LIMIT ?
+                    )
+                ''', (item_id, item_id, keep))
+            conn.commit()
+    
+    def get_latest_page_snapshot(self, item_id: int) -> Optional[Dict]:
+        """Most recent snapshot of an item with its decompressed page_source"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM page_snapshots
+                WHERE item_id = ?
+                ORDER BY captured_at DESC
+                LIMIT 1
+            ''', (item_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            snapshot = dict(row)
+            snapshot['page_source'] = zlib.decompress(snapshot.pop('content')).decode('utf-8')
+            return snapshot
+    
+    def get_archived_page_snapshots(self, item_id: int) -> List[Dict]:
+        """Archived snapshots of an item, oldest first, with content still compressed"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM page_snapshots
+                WHERE item_id = ? AND archived = 1
+                ORDER BY captured_at
+            ''', (item_id,))
+            return [dict(row) for row in cursor.fetchall()]
+    
     def add_email(self, email: str):
         with self.get_connection() as conn:
             cursor = conn.cursor()
@@ -150,4 +497,191 @@ class Database:
         with self.get_connection() as conn:
             cursor = conn.cursor()
             cursor.execute('SELECT email FROM emails WHERE is_active = 1')
-            return [row['email'] for row in cursor.fetchall()] 
\ No newline at end of file
+            return [row['email'] for row in cursor.fetchall()]
+    
+    def heartbeat_node(self, node_id: str, hostname: str, pid: int):
+        """Register a tracker node or refresh its heartbeat"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO tracker_nodes (node_id, hostname, pid, last_heartbeat)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(node_id) DO UPDATE SET last_heartbeat = excluded.last_heartbeat
+            ''', (node_id, hostname, pid, time.time()))
+            conn.commit()
+    
+    def remove_node(self, node_id: str):
+        """Unregister a tracker node and give up all of its leases"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM item_leases WHERE node_id = ?', (node_id,))
+            cursor.execute('DELETE FROM tracker_nodes WHERE node_id = ?', (node_id,))
+            conn.commit()
+    
+    def get_active_nodes(self, stale_after: float) -> List[Dict]:
+        """Get nodes whose heartbeat is more recent than stale_after seconds"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT n.*, COUNT(l.item_id) AS leased_items
+                FROM tracker_nodes n
+                LEFT JOIN item_leases l ON l.node_id = n.node_id AND l.expires_at >= ?
+                WHERE n.last_heartbeat >= ?
+                GROUP BY n.node_id
+                ORDER BY n.node_id
+            ''', (time.time(), time.time() - stale_after))
+            return [dict(row) for row in cursor.fetchall()]
+    
+    def sync_item_leases(self, node_id: str, ttl: float, stale_after: float) -> List[int]:
+        """
+        Renew this node's leases and rebalance them to a fair share.
+        
+        Runs in a single write transaction so concurrent nodes never claim the
+        same item. Expired leases (from crashed nodes) are treated as free.
+        Returns the ids of the items this node now holds.
+        """
+        now = time.time()
+        with self.get_connection() as conn:
+            conn.isolation_level = None
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                # Forget leases on items that no longer exist
+                cursor.execute('DELETE FROM item_leases WHERE item_id NOT IN (SELECT id FROM items)')
+                
+                cursor.execute('UPDATE item_leases SET expires_at = ? WHERE node_id = ?',
+                               (now + ttl, node_id))
+                
+                cursor.execute('SELECT COUNT(*) FROM items')
+                total_items = cursor.fetchone()[0]
+                cursor.execute('SELECT COUNT(*) FROM tracker_nodes WHERE last_heartbeat >= ?',
+                               (now - stale_after,))
+                active_nodes = max(cursor.fetchone()[0], 1)
+                fair_share = -(-total_items // active_nodes)  # ceil division
+                
+                cursor.execute('SELECT item_id FROM item_leases WHERE node_id = ? ORDER BY item_id',
+                               (node_id,))
+                owned = [row['item_id'] for row in cursor.fetchall()]
+                
+                if len(owned) > fair_share:
+                    # Hand surplus items back so newly joined nodes can pick them up
+                    surplus = owned[fair_share:]
+                    cursor.executemany('DELETE FROM item_leases WHERE item_id = ? AND node_id = ?',
+                                       [(item_id, node_id) for item_id in surplus])
+                    owned = owned[:fair_share]
+                elif len(owned) < fair_share:
+                    cursor.execute('''
+                        SELECT i.id FROM items i
+                        LEFT JOIN item_leases l ON l.item_id = i.id
+                        WHERE l.item_id IS NULL OR l.expires_at < ?
+                        ORDER BY i.id
+                        LIMIT ?
+                    ''', (now, fair_share - len(owned)))
+                    claimed = [row['id'] for row in cursor.fetchall()]
+                    cursor.executemany('''
+                        INSERT OR REPLACE INTO item_leases (item_id, node_id, expires_at)
+                        VALUES (?, ?, ?)
+                    ''', [(item_id, node_id, now + ttl) for item_id in claimed])
+                    owned.extend(claimed)
+                
+                cursor.execute('COMMIT')
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
+            return owned
+    
+    def add_tracker_command(self, command: str, item_id: int = None, payload: Dict = None) -> int:
+        """Queue a command for the tracker workers"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT INTO tracker_commands (command, item_id, payload)
+                VALUES (?, ?, ?)
+            ''', (command, item_id, json.dumps(payload) if payload is not None else None))
+            conn.commit()
+            return cursor.lastrowid
+    
+    def claim_tracker_commands(self, node_id: str, limit: int = 20) -> List[Dict]:
+        """Atomically claim pending commands so each runs on exactly one worker"""
+        with self.get_connection() as conn:
+            conn.isolation_level = None
+            cursor = conn.cursor()
+            cursor.execute('BEGIN IMMEDIATE')
+            try:
+                cursor.execute('''
+                    SELECT * FROM tracker_commands
+                    WHERE status = 'pending'
+                    ORDER BY id
+                    LIMIT ?
+                ''', (limit,))
+                commands = [dict(row) for row in cursor.fetchall()]
+                cursor.executemany('''
+                    UPDATE tracker_commands SET status = 'claimed', node_id = ?
+                    WHERE id = ?
+                ''', [(node_id, command['id']) for command in commands])
+                cursor.execute('COMMIT')
+            except Exception:
+                cursor.execute('ROLLBACK')
+                raise
+        for command in commands:
+            command['payload'] = json.loads(command['payload']) if command['payload'] else {}
+        return commands
+    
+    def complete_tracker_command(self, command_id: int, result: Dict, failed: bool = False):
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE tracker_commands
+                SET status = ?, result = ?, completed_at = CURRENT_TIMESTAMP
+                WHERE id = ?
+            ''', ('failed' if failed else 'done', json.dumps(result), command_id))
+            # Keep the table small; finished commands are only interesting briefly
+            cursor.execute('''
+                DELETE FROM tracker_commands
+                WHERE status IN ('done', 'failed') AND completed_at < datetime('now', '-1 day')
+            ''')
+            conn.commit()
+    
+    def get_tracker_command(self, command_id: int) -> Optional[Dict]:
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT * FROM tracker_commands WHERE id = ?', (command_id,))
+            row = cursor.fetchone()
+            if not row:
+                return None
+            command = dict(row)
+            command['payload'] = json.loads(command['payload']) if command['payload'] else {}
+            command['result'] = json.loads(command['result']) if command['result'] else None
+            return command
+    
+    def publish_tracker_status(self, node_id: str, status: Dict):
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                INSERT OR REPLACE INTO tracker_status (node_id, status, updated_at)
+                VALUES (?, ?, ?)
+            ''', (node_id, json.dumps(status), time.time()))
+            conn.commit()
+    
+    def remove_tracker_status(self, node_id: str):
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('DELETE FROM tracker_status WHERE node_id = ?', (node_id,))
+            conn.commit()
+    
+    def get_tracker_statuses(self, stale_after: float) -> List[Dict]:
+        """Get status snapshots of workers that published within stale_after seconds"""
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM tracker_status
+                WHERE updated_at >= ?
+                ORDER BY node_id
+            ''', (time.time() - stale_after,))
+            statuses = []
+            for row in cursor.fetchall():
+                status = json.loads(row['status'])
+                status['node_id'] = row['node_id']
+                status['updated_at'] = row['updated_at']
+                statuses.append(status)
+            return statuses
@@ -11,6 +11,8 @@ class PageSourceLogger:
         self.log_retention_hours = 24
         self.cleanup_thread = None
         self.running = False
+        # Lets stop_cleanup_thread interrupt the hourly wait instead of blocking on it
+        self._stop_event = threading.Event()
         
         # Create log directory if it doesn't exist
         os.makedirs(self.log_dir, exist_ok=True)
@@ -19,6 +21,7 @@ class PageSourceLogger:
         """Start the cleanup thread that removes old log files"""
         if not self.running:
             self.running = True
+            self._stop_event.clear()
             self.cleanup_thread = threading.Thread(target=self._cleanup_loop, daemon=True, name="LogCleanup")
             self.cleanup_thread.start()
             print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Page source logger cleanup started")
@@ -26,6 +29,7 @@ class PageSourceLogger:
     def stop_cleanup_thread(self):
         """Stop the cleanup thread"""
         self.running = False
+        self._stop_event.set()
         if self.cleanup_thread:
             self.cleanup_thread.join()
     
@@ -34,10 +38,10 @@ class PageSourceLogger:
         while self.running:
             try:
                 self._cleanup_old_files()
-                time.sleep(self.cleanup_interval)
+                self._stop_event.wait(self.cleanup_interval)
             except Exception as e:
                 print(f"Error in cleanup loop: {str(e)}")
-                time.sleep(60)  # Wait a minute before retrying
+                self._stop_event.wait(60)  # Wait a minute before retrying
     
     def _cleanup_old_files(self):
         """Delete log files older than the retention period"""
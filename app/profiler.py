@@ -0,0 +1,172 @@
+import os
+import sys
+import threading
+import time
+import traceback
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+from typing import Dict, List, Optional
+
+MAX_PROFILE_SECONDS = 60
+_profile_lock = threading.Lock()
+
+
+class ProfilerBusy(Exception):
+    """Raised when a sampling profile is requested while another is running"""
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def _stack(frame) -> List[str]:
+    """Function labels from the thread's entry point down to the running frame"""
+    stack = []
+    while frame is not None:
+        stack.append(_frame_label(frame))
+        frame = frame.f_back
+    stack.reverse()
+    return stack
+
+
+def sample_profile(seconds: float = 10.0, interval: float = 0.005, thread_prefix: Optional[str] = None) -> Dict:
+    """
+    Sample the stacks of all threads for a fixed time.
+
+    Nothing is installed in the interpreter: the calling thread reads
+    sys._current_frames() every interval seconds, so there is no cost when
+    no profile is running and the profiled threads are never paused.
+    Only threads whose name starts with thread_prefix are sampled if given.
+    Returns folded stacks (flame graph input) and the hottest functions.
+    """
+    seconds = min(max(seconds, 0.1), MAX_PROFILE_SECONDS)
+    interval = max(interval, 0.001)
+    if not _profile_lock.acquire(blocking=False):
+        raise ProfilerBusy("A profile is already running")
+
+    try:
+        own_ident = threading.get_ident()
+        folded = Counter()
+        self_samples = Counter()
+        total_samples = Counter()
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+
+        while time.perf_counter() < deadline:
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == own_ident:
+                    continue
+                name = names.get(ident, f"thread-{ident}")
+                if thread_prefix and not name.startswith(thread_prefix):
+                    continue
+                stack = _stack(frame)
+                folded[';'.join([name] + stack)] += 1
+                self_samples[stack[-1]] += 1
+                for label in set(stack):
+                    total_samples[label] += 1
+            samples += 1
+            time.sleep(interval)
+
+        return {
+            'started_at': datetime.now().isoformat(),
+            'seconds': round(time.perf_counter() - started, 3),
+            'interval': interval,
+            'samples': samples,
+            'folded': dict(folded),
+            'top_self': [{'function': label, 'samples': count} for label, count in self_samples.most_common(25)],
+            'top_total': [{'function': label, 'samples': count} for label, count in total_samples.most_common(25)],
+        }
+    finally:
+        _profile_lock.release()
+
+
+def folded_text(profile: Dict) -> str:
+    """Profile in folded-stack format, for flamegraph.pl or speedscope"""
+    return ''.join(f"{stack} {count}\n" for stack, count in sorted(profile['folded'].items()))
+
+
+def heap_start(frames: int = 10) -> Dict:
+    """Start tracing allocations; until this is called tracemalloc costs nothing"""
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+    return heap_status()
+
+
+def heap_stop() -> Dict:
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+    return heap_status()
+
+
+def heap_status() -> Dict:
+    tracing = tracemalloc.is_tracing()
+    current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+    return {'tracing': tracing, 'traced_bytes': current, 'peak_traced_bytes': peak}
+
+
+def heap_snapshot(top: int = 25, group_by: str = 'lineno') -> Dict:
+    """
+    Top allocation sites of memory still held since heap_start.
+
+    Large retained strings such as page sources show up as big sites with a
+    handful of blocks at the line that produced them.
+    """
+    if not tracemalloc.is_tracing():
+        return {**heap_status(), 'error': 'Allocation tracing is not running; start it first'}
+    if group_by not in ('lineno', 'filename', 'traceback'):
+        group_by = 'lineno'
+
+    snapshot = tracemalloc.take_snapshot().filter_traces((
+        tracemalloc.Filter(False, tracemalloc.__file__),
+        tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    ))
+    stats = snapshot.statistics(group_by)
+    return {
+        **heap_status(),
+        'group_by': group_by,
+        'total_bytes': sum(stat.size for stat in stats),
+        'top': [{
+            'size_bytes': stat.size,
+            'blocks': stat.count,
+            'average_bytes': stat.size // stat.count if stat.count else 0,
+            'traceback': stat.traceback.format()[-6:],
+        } for stat in stats[:top]],
+    }
+
+
+def thread_stacks() -> Dict:
+    """Current stack of every live thread"""
+    frames = sys._current_frames()
+    threads = []
+    for thread in threading.enumerate():
+        frame = frames.get(thread.ident)
+        threads.append({
+            'name': thread.name,
+            'ident': thread.ident,
+            'daemon': thread.daemon,
+            'stack': traceback.format_stack(frame) if frame else [],
+        })
+    return {'taken_at': datetime.now().isoformat(), 'pid': os.getpid(), 'threads': threads}
+
+
+def run_diagnostic(action: str, options: Dict) -> Dict:
+    """Run a diagnostic by name; used both in-process and through the control channel"""
+    if action == 'profile':
+        return sample_profile(
+            seconds=float(options.get('seconds', 10)),
+            interval=float(options.get('interval', 0.005)),
+            thread_prefix=options.get('thread_prefix') or None
+        )
+    if action == 'heap_start':
+        return heap_start(int(options.get('frames', 10)))
+    if action == 'heap_stop':
+        return heap_stop()
+    if action == 'heap':
+        return heap_snapshot(int(options.get('top', 25)), options.get('group_by', 'lineno'))
+    if action == 'threads':
+        return thread_stacks()
+    raise ValueError(f"Unknown diagnostic: {action}")
@@ -0,0 +1,114 @@
+import re
+import time
+from typing import Optional, Tuple
+
+from app.structured_data import extract_availability
+
+
+def evaluate_rule(page_source: str, pattern: str, expected_count: int) -> Tuple[bool, int]:
+    """
+    Apply an item's rule to a page.
+    Returns (is_available, match_count)
+    
+    If the number of case-insensitive pattern matches >= expected_count the
+    item is OUT OF STOCK, otherwise it is AVAILABLE.
+    """
+    matches = re.findall(pattern, page_source, re.IGNORECASE)
+    match_count = len(matches)
+    return match_count < expected_count, match_count
+
+
+RULE_TYPES = ('regex', 'structured')
+
+
+def truncate_at_marker(page_source: str, end_marker: Optional[str]) -> str:
+    """Page text before the first (case-insensitive) end marker; the whole page if there is none"""
+    if not end_marker:
+        return page_source
+    position = page_source.lower().find(end_marker.lower())
+    return page_source if position < 0 else page_source[:position]
+
+
+def apply_rule(page_source: str, rule_type: str, pattern: str, expected_count: int,
+               end_marker: Optional[str] = None) -> Tuple[Optional[bool], str]:
+    """
+    Apply an item's rule of either type.
+    Returns (is_available, description of what decided it)
+    
+    Only the text before end_marker is considered, if given. is_available
+    is None when a structured rule finds no availability data.
+    """
+    page_source = truncate_at_marker(page_source, end_marker)
+    if rule_type == 'structured':
+        found = extract_availability(page_source)
+        if found is None:
+            return None, "no structured availability data"
+        return found['is_available'], f"{found['source']} ({found['values']} values)"
+    
+    is_available, match_count = evaluate_rule(page_source, pattern, expected_count)
+    return is_available, f"matches: {match_count}/{expected_count}"
+
+
+class IncrementalMatcher:
+    """
+    Applies a regex rule to a page that arrives in chunks.
+    
+    Matches are counted as text is fed, and `done` is set as soon as the
+    rule is decided: expected_count matches have been seen (out of stock)
+    or the end marker has passed. Only the last `window` characters are
+    carried over between chunks, so a match may span a chunk boundary as
+    long as it is shorter than the window. With pattern=None nothing is
+    matched and the matcher only watches for the end marker.
+    """
+    
+    def __init__(self, pattern: Optional[str], expected_count: int, end_marker: Optional[str] = None,
+                 window: int = 4096):
+        self.regex = re.compile(pattern, re.IGNORECASE) if pattern is not None else None
+        self.expected_count = expected_count
+        self.end_marker = end_marker.lower() if end_marker else None
+        self.window = max(window, len(self.end_marker or ''))
+        self.buffer = ''
+        self.match_count = 0
+        self.chars_seen = 0
+        self.marker_seen = False
+        self.done = False
+        self.seconds = 0.0
+    
+    @property
+    def is_available(self) -> bool:
+        return self.match_count < self.expected_count
+    
+    def feed(self, text: str, final: bool = False):
+        if self.done:
+            return
+        started = time.perf_counter()
+        self.chars_seen += len(text)
+        buffer = self.buffer + text
+        
+        if self.end_marker:
+            position = buffer.lower().find(self.end_marker)
+            if position >= 0:
+                buffer = buffer[:position]
+                self.marker_seen = final = True
+        
+        # Matches ending in the last `window` chars may still grow with the next chunk
+        limit = len(buffer) if final else len(buffer) - self.window
+        keep_from = len(buffer) if final else max(limit, 0)
+        if self.regex is not None:
+            for match in self.regex.finditer(buffer):
+                if match.end() > limit:
+                    keep_from = min(keep_from, match.start())
+                    break
+                self.match_count += 1
+                keep_from = max(keep_from, match.end())
+                if self.match_count >= self.expected_count:
+                    self.done = True
+                    break
+        
+        self.buffer = buffer[keep_from:]
+        self.done = self.done or final
+        self.seconds += time.perf_counter() - started
+    
+    def finish(self):
+        """Count the remaining buffered text once the page has been read completely"""
+        self.feed('', final=True)
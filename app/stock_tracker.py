@@ -1,49 +1,117 @@
 import threading
 import time
 from datetime import datetime
-from typing import Dict
-import sys
+from typing import Dict, List, Optional
 import os
 import uuid
 from queue import Queue, PriorityQueue
 from dataclasses import dataclass, field
 
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
 from app.models import Database
 from app.email_notifier import EmailNotifier
 from app.page_source_logger import PageSourceLogger
-from scrapers.selenium_scraper import SeleniumScraper
+from app.work_queue import LocalWorkQueue, create_work_queue
+from app.domain_health import DomainHealth
+from app.metrics import Metrics, summarize_stages
+from app.admission import AdmissionController
+from app.profiler import run_diagnostic
+from scrapers import errors
+from scrapers.errors import error_kind
 
 @dataclass(order=True)
 class CheckTask:
     priority: int
     item: Dict = field(compare=False)
     timestamp: float = field(default_factory=time.time, compare=False)
+    # When the check started waiting for an admission slot
+    waiting_since: Optional[float] = field(default=None, compare=False)
 
 class StockTracker:
-    def __init__(self, check_interval: int = 30, max_concurrent_checks: int = 1):
-        self.db = Database()
+    def __init__(self, check_interval: int = 30, max_concurrent_checks: int = 1, work_queue=None, db: Database = None,
+                 domain_health: DomainHealth = None, admission: AdmissionController = None,
+                 browser_mode: str = 'process', snapshot_retention: int = 50,
+                 snapshot_archive_interval: int = 3600, warmup_window: int = None,
+                 scraper_backend: str = 'selenium'):
+        self.db = db or Database()
         self.email_notifier = EmailNotifier()
         self.page_logger = PageSourceLogger()
-        # Use singleton scraper with limited workers
-        self.scraper = SeleniumScraper(headless=True, max_workers=max_concurrent_checks)
+        # Scraper (and Selenium itself) is created on first browser check, see `scraper`
+        self._scraper = None
+        self._scraper_lock = threading.Lock()
+        self._http_scraper = None
+        self.browser_mode = browser_mode
+        # 'selenium' (WebDriver) or 'cdp' (Chrome DevTools protocol, see scrapers/cdp_scraper.py)
+        if scraper_backend not in ('selenium', 'cdp'):
+            raise ValueError(f"Unknown scraper backend: {scraper_backend}")
+        self.scraper_backend = scraper_backend
         self.check_interval = check_interval
         self.running = False
         self.thread = None
         self.worker_threads = []
         self.check_queue = PriorityQueue()
         self.processing_items = set()  # Track items currently being processed
+        # Force checks queued or running in this process, per item id
+        self.force_check_counts: Dict[int, int] = {}
+        self.force_check_lock = threading.Lock()
         self.tracker_id = str(uuid.uuid4())[:8]  # Short ID for debugging
         self.max_concurrent_checks = max_concurrent_checks
         self.last_check_times = {}  # Track last check time for rate limiting
         self.min_check_interval = 5  # Minimum seconds between checks of same item
-        
+        # Per-item schedule, persisted in scheduler_state so restarts resume it.
+        # Items overdue on (re)start are spread over warmup_window seconds.
+        self.next_due = {}
+        self.warmup_window = check_interval if warmup_window is None else warmup_window
+        self.scheduler_tick = 1  # Seconds between scheduler passes
+        self.item_refresh_interval = 5  # Seconds between reloads of the item list
+        self._wake = threading.Event()  # Set to end the scheduler's wait early (stop)
+        # Page snapshots for rule dry-runs and backtests: every transition is archived,
+        # steady states at most once per snapshot_archive_interval
+        self.snapshot_retention = snapshot_retention
+        self.snapshot_archive_interval = snapshot_archive_interval
+        self.last_snapshot_archive = {}
+        # Decides which items this node schedules (all of them unless distributed)
+        self.work_queue = work_queue or LocalWorkQueue()
+        # Circuit breaker so one dead retailer doesn't eat every worker's time
+        self.domain_health = domain_health or DomainHealth()
+        # Decides how many of the max_concurrent_checks workers may run a browser check right now
+        self.admission = admission or AdmissionController(max_concurrent_checks, enabled=False)
+        self.metrics = Metrics()
+        self.metrics.register_collector(self._collect_gauges)
+
+    @property
+    def scraper(self):
+        """Singleton scraper with limited workers, created on first use"""
+        if self._scraper is None:
+            with self._scraper_lock:
+                if self._scraper is None and self.scraper_backend == 'cdp':
+                    from scrapers.cdp_scraper import CdpScraper
+                    self._scraper = CdpScraper(max_workers=self.max_concurrent_checks)
+                elif self._scraper is None:
+                    from scrapers.selenium_scraper import SeleniumScraper
+                    self._scraper = SeleniumScraper(headless=True, max_workers=self.max_concurrent_checks,
+                                                    browser_mode=self.browser_mode)
+        return self._scraper
+
+    @property
+    def http_scraper(self):
+        """Plain HTTP fetcher for items with fetch_mode 'http', created on first use"""
+        if self._http_scraper is None:
+            with self._scraper_lock:
+                if self._http_scraper is None:
+                    from scrapers.http_scraper import HttpScraper
+                    self._http_scraper = HttpScraper()
+        return self._http_scraper
+    
     def start(self):
         """Start the stock tracking thread and workers"""
         if not self.running:
             self.running = True
             
+            # Join the work queue before scheduling so we know which items are ours
+            self.work_queue.start()
+            self._wake.clear()
+            self.next_due = {}
+            
             # Start page source logger cleanup thread
             self.page_logger.start_cleanup_thread()
             
@@ -62,6 +130,7 @@ class StockTracker:
     def stop(self):
         """Stop the stock tracking thread and workers"""
         self.running = False
+        self._wake.set()
         
         # Stop page source logger cleanup thread
         self.page_logger.stop_cleanup_thread()
@@ -75,22 +144,80 @@ class StockTracker:
             self.thread.join()
         for worker in self.worker_threads:
             worker.join()
+        
+        # Release our items to other nodes
+        self.work_queue.stop()
             
         print("Stock tracker stopped.")
     
+    def _resume_items(self, items: List[Dict], now: float):
+        """
+        Schedule items this tracker hasn't scheduled yet (all of them at start,
+        or items taken over from another node) from their persisted state.
+        
+        Items that aren't overdue keep their due time. Overdue and never
+        checked items are spread evenly over the warm-up window, most overdue
+        first, instead of all being queued on the first pass. Force checks
+        that were still pending are queued straight away.
+        """
+        new_items = [item for item in items if item['id'] not in self.next_due]
+        if not new_items:
+            return
+        
+        state = self.db.get_scheduler_state()
+        overdue = []
+        for item in new_items:
+            item_id = item['id']
+            item_state = state.get(item_id, {})
+            if item_state.get('last_check_at'):
+                self.last_check_times[item_id] = item_state['last_check_at']
+            # Skip force checks this process already queued (e.g. for an item just added)
+            if item_state.get('force_pending') and not self.force_check_counts.get(item_id):
+                self._add_force_check(item_id)
+                self.check_queue.put(CheckTask(priority=0, item=item))
+            
+            due = item_state.get('next_due_at') or 0
+            if due > now:
+                self.next_due[item_id] = due
+            else:
+                overdue.append((due, item_id))
+        
+        overdue.sort()
+        spacing = self.warmup_window / len(overdue) if overdue else 0
+        for position, (_, item_id) in enumerate(overdue):
+            self.next_due[item_id] = now + position * spacing
+        
+        if len(new_items) > 1:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Resumed schedule of {len(new_items)} items, "
+                  f"{len(overdue)} overdue spread over {self.warmup_window}s")
+    
     def _run_scheduler(self):
-        """Scheduler that adds items to check queue periodically"""
+        """Scheduler that queues each item when it is due"""
+        items = []
+        last_refresh = 0
         while self.running:
             try:
-                items = self.db.get_all_items()
                 current_time = time.time()
                 
+                if current_time - last_refresh >= self.item_refresh_interval:
+                    items = self.work_queue.owned_items(self.db.get_all_items())
+                    self._resume_items(items, current_time)
+                    # Forget items that were deleted or handed to another node
+                    owned_ids = {item['id'] for item in items}
+                    for item_id in list(self.next_due):
+                        if item_id not in owned_ids:
+                            del self.next_due[item_id]
+                    last_refresh = current_time
+                
                 for item in items:
                     if not self.running:
                         break
                     
                     item_id = item['id']
                     
+                    if self.next_due.get(item_id, current_time) > current_time:
+                        continue
+                    
                     # Skip if item is already in processing
                     if item_id in self.processing_items:
                         continue
@@ -100,16 +227,20 @@ class StockTracker:
                     if current_time - last_check < self.min_check_interval:
                         continue
                     
+                    # Domain is backing off after repeated failures
+                    if self.domain_health.is_open(item['url']):
+                        continue
+                    
                     # Add to queue with normal priority
                     task = CheckTask(priority=1, item=item)
                     self.check_queue.put(task)
-                
-                # Wait for the next check interval
-                time.sleep(self.check_interval)
+                    self.next_due[item_id] = current_time + self.check_interval
                 
             except Exception as e:
                 print(f"Error in scheduler loop: {str(e)}")
-                time.sleep(5)  # Wait before retrying
+            
+            # Wait for the next pass (stop() ends the wait)
+            self._wake.wait(self.scheduler_tick)
     
     def _worker(self):
         """Worker thread that processes items from the queue"""
@@ -122,23 +253,68 @@ class StockTracker:
                 if task.item is None:
                     break
                 
-                # Process the item
-                self._check_item(task.item)
+                # Scheduled checks of items handed to another node since they were queued
+                if task.priority > 0 and not self.work_queue.owns(task.item['id']):
+                    continue
+                
+                force = task.priority == 0
+                
+                # HTTP checks don't start a browser, so they skip admission control
+                if task.item.get('fetch_mode') == 'http':
+                    self.metrics.observe('stock_tracker_stage_seconds', time.time() - task.timestamp,
+                                         stage='queue_wait')
+                    self._check_item(task.item, force=force)
+                    continue
+                
+                # Force checks are always admitted; scheduled ones wait or are shed under pressure
+                if self._scraper:
+                    self.admission.set_browser_count(self._scraper.driver_count)
+                waiting_since = task.waiting_since or time.time()
+                admitted = self.admission.acquire(force=force, waiting_since=task.waiting_since)
+                if admitted is None:
+                    # Back into the queue so a force check queued meanwhile can take this worker
+                    task.waiting_since = waiting_since
+                    self.check_queue.put(task)
+                    continue
+                if not admitted:
+                    self.metrics.inc('stock_tracker_checks_total',
+                                     domain=self.domain_health.domain_of(task.item['url']), result='shed')
+                    continue
+                
+                # Browser checks' queue wait includes any wait for an admission slot
+                self.metrics.observe('stock_tracker_stage_seconds', time.time() - task.timestamp, stage='queue_wait')
+                
+                try:
+                    # Process the item (force checks bypass the circuit breaker)
+                    self._check_item(task.item, force=force)
+                finally:
+                    self.admission.release()
+                    # Give memory back when the box is under pressure
+                    excess = self.admission.idle_browsers_to_close()
+                    if excess and self._scraper:
+                        self._scraper.close_idle_drivers(excess)
                 
             except:
                 # Queue is empty or timeout, continue
                 continue
     
-    def _check_item(self, item: Dict):
+    def _check_item(self, item: Dict, force: bool = False):
         """Check a single item's availability"""
         if not item:
             return
             
         item_id = item['id']
         
+        domain = self.domain_health.domain_of(item['url'])
+        if not force and not self.domain_health.allow_request(item['url']):
+            self.metrics.inc('stock_tracker_checks_total', domain=domain, result='skipped')
+            return
+        
         # Mark as processing
         self.processing_items.add(item_id)
         self.last_check_times[item_id] = time.time()
+        # Whether the circuit breaker has been told how the check went
+        outcome_recorded = False
         
         try:
             timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
@@ -147,33 +323,68 @@ class StockTracker:
             # Get previous availability
             previous_availability = item['is_available']
             
-            # First check without page source to determine if availability changed
-            is_available, error, _ = self.scraper.check_availability(
+            # Selenium has the whole page anyway, so keep it for the snapshot and log.
+            # Scrapers that can read less (streamed HTTP checks stop once the rule is
+            # decided, CDP reads only the structured-data tags of a structured rule)
+            # fetch the full page only when a snapshot is due.
+            streaming = item.get('fetch_mode') == 'http'
+            rule_type = item.get('rule_type', 'regex')
+            timings = {}
+            check_started = time.perf_counter()
+            scraper = self.http_scraper if streaming else self.scraper
+            partial = scraper.reads_partial_page(rule_type)
+            is_available, error, page_source = scraper.check_availability(
                 item['url'],
                 item['rule_pattern'],
                 item['rule_count'],
-                return_page_source=False
+                return_page_source=not partial or self._snapshot_due(item_id),
+                timings=timings,
+                rule_type=rule_type,
+                end_marker=item.get('end_marker')
             )
+            self.metrics.observe('stock_tracker_check_seconds', time.perf_counter() - check_started,
+                                 domain=domain, fetch_mode=item.get('fetch_mode', 'browser'))
+            for stage, seconds in timings.items():
+                self.metrics.observe('stock_tracker_stage_seconds', seconds, stage=stage)
             
             if error:
-                print(f"Error checking {item['name']}: {error}")
+                kind = error_kind(error)
+                print(f"Error checking {item['name']} ({kind}): {error}")
+                if kind == errors.SITE:
+                    self.domain_health.record_failure(item['url'], error)
+                else:
+                    # Local and item problems say nothing about the retailer's health
+                    self.domain_health.release_probe(item['url'])
+                outcome_recorded = True
+                self.metrics.inc('stock_tracker_checks_total', domain=domain,
+                                 result='error' if kind == errors.SITE else f'{kind}_error')
                 return
+            self.domain_health.record_success(item['url'])
+            outcome_recorded = True
+            self.metrics.inc('stock_tracker_checks_total', domain=domain,
+                             result='available' if is_available else 'out_of_stock')
             
             # Check if availability changed
             availability_changed = (previous_availability is not None and previous_availability != is_available)
             
-            # If availability changed, get page source for logging
-            page_source = None
-            if availability_changed:
-                print(f"Availability changed for {item['name']}: {'Available' if is_available else 'Out of Stock'}")
-                
-                # Get page source for logging
-                _, _, page_source = self.scraper.check_availability(
+            transition = previous_availability is None or availability_changed
+            if partial and transition and not page_source:
+                # Transitions are rare, so fetching the page again for the log costs little
+                _, _, page_source = scraper.check_availability(
                     item['url'],
                     item['rule_pattern'],
                     item['rule_count'],
-                    return_page_source=True
+                    return_page_source=True,
+                    rule_type=rule_type,
+                    end_marker=item.get('end_marker')
                 )
+            
+            if page_source:
+                with self.metrics.timer('stock_tracker_stage_seconds', stage='snapshot'):
+                    self._save_snapshot(item_id, page_source, is_available, transition)
+            
+            if availability_changed:
+                print(f"Availability changed for {item['name']}: {'Available' if is_available else 'Out of Stock'}")
                 
                 # Log page source
                 if page_source:
@@ -186,39 +397,177 @@ class StockTracker:
                         previous_availability=previous_availability
                     )
                 
-                # Get email recipients
-                recipients = self.db.get_active_email_addresses()
-                
-                if recipients:
-                    # Send notification
-                    self.email_notifier.send_availability_notification(
-                        recipients,
-                        item['name'],
-                        item['url'],
-                        is_available
-                    )
+                with self.metrics.timer('stock_tracker_stage_seconds', stage='notify'):
+                    # Get email recipients
+                    recipients = self.db.get_active_email_addresses()
+                    
+                    if recipients:
+                        # Send notification
+                        self.email_notifier.send_availability_notification(
+                            recipients,
+                            item['name'],
+                            item['url'],
+                            is_available
+                        )
             
             # Update in database
-            self.db.update_item_availability(item_id, is_available)
+            with self.metrics.timer('stock_tracker_stage_seconds', stage='db_write'):
+                self.db.update_item_availability(item_id, is_available)
             
         except Exception as e:
             print(f"Error checking item {item['name']}: {str(e)}")
+            if not outcome_recorded:
+                # A failure on our side (e.g. Chrome not starting) isn't the site's fault, but the
+                # half-open probe must be freed or the domain would be skipped for good
+                self.domain_health.release_probe(item['url'])
+                self.metrics.inc('stock_tracker_checks_total', domain=domain, result='local_error')
         finally:
             # Remove from processing set
             self.processing_items.discard(item_id)
+            self._record_check(item_id, force)
+            if force:
+                self._finish_force_check(item_id)
+    
+    def _record_check(self, item_id: int, force: bool):
+        """Schedule the item's next check an interval after this one started, and persist it"""
+        checked_at = self.last_check_times.get(item_id, time.time())
+        next_due = checked_at + self.check_interval
+        if item_id in self.next_due:
+            self.next_due[item_id] = next_due
+        try:
+            self.db.record_item_check(item_id, checked_at, next_due, force=force)
+        except Exception as e:
+            print(f"Error saving schedule of item {item_id}: {str(e)}")
+    
+    def _snapshot_due(self, item_id: int) -> bool:
+        """Whether a steady-state snapshot of the item should be archived now"""
+        return time.time() - self.last_snapshot_archive.get(item_id, 0) >= self.snapshot_archive_interval
+    
+    def _save_snapshot(self, item_id: int, page_source: str, is_available: bool, transition: bool):
+        """Store the checked page; transitions and periodic samples are archived for backtests"""
+        now = time.time()
+        archive = transition or self._snapshot_due(item_id)
+        try:
+            self.db.save_page_snapshot(item_id, page_source, is_available,
+                                       archive=archive, keep=self.snapshot_retention)
+            if archive:
+                self.last_snapshot_archive[item_id] = now
+        except Exception as e:
+            print(f"Error saving page snapshot for item {item_id}: {str(e)}")
     
     def force_check_item(self, item_id: int):
         """Force check a specific item immediately"""
-        items = self.db.get_all_items()
-        item = next((i for i in items if i['id'] == item_id), None)
+        item = self.db.get_item(item_id)
         
         if item:
             # Add with high priority (0 is highest)
             task = CheckTask(priority=0, item=item)
+            # Persisted first so the check still happens if we restart before it runs
+            # (and so a fast check's completion can't be overwritten by this)
+            self.db.set_force_pending(item_id)
+            self._add_force_check(item_id)
             self.check_queue.put(task)
             
             # Update last check time to prevent immediate re-checking
             self.last_check_times[item_id] = time.time()
             
             return True
-        return False 
+        return False
+    
+    def _add_force_check(self, item_id: int):
+        with self.force_check_lock:
+            self.force_check_counts[item_id] = self.force_check_counts.get(item_id, 0) + 1
+    
+    def _finish_force_check(self, item_id: int):
+        with self.force_check_lock:
+            remaining = self.force_check_counts.get(item_id, 0) - 1
+            if remaining > 0:
+                self.force_check_counts[item_id] = remaining
+            else:
+                self.force_check_counts.pop(item_id, None)
+    
+    def _collect_gauges(self, metrics: Metrics):
+        """Fill in point-in-time gauges before a metrics snapshot"""
+        metrics.set_gauge('stock_tracker_queue_depth', self.check_queue.qsize())
+        metrics.set_gauge('stock_tracker_processing_items', len(self.processing_items))
+        if self._scraper:
+            pool = self._scraper.get_status()
+            busy = pool['browsers'] - pool['idle_browsers']
+            metrics.set_gauge('stock_tracker_browsers', busy, state='busy')
+            metrics.set_gauge('stock_tracker_browsers', pool['idle_browsers'], state='idle')
+            metrics.set_gauge('stock_tracker_pool_utilization', round(busy / pool['max_browsers'], 3))
+        metrics.set_gauge('stock_tracker_admission_limit', self.admission.limit)
+    
+    def get_metrics(self):
+        """Metric snapshots as (extra_labels, snapshot) pairs for render_prometheus"""
+        return [({}, self.metrics.snapshot())]
+    
+    def run_diagnostic(self, action: str, options: Dict) -> Dict:
+        """Profile this process (the tracker runs in it)"""
+        return run_diagnostic(action, options)
+    
+    def get_domain_health(self):
+        """Per-domain circuit breaker state and failure stats"""
+        return self.domain_health.get_status()
+    
+    def get_status(self) -> Dict:
+        """Get a JSON-serialisable snapshot of the tracker state"""
+        snapshot = self.metrics.snapshot()
+        return {
+            'running': self.running,
+            'check_interval': self.check_interval,
+            'tracker_id': self.tracker_id,
+            'queue_size': self.check_queue.qsize(),
+            'processing_items': len(self.processing_items),
+            'scheduled_items': len(self.next_due),
+            'overdue_items': sum(1 for due in list(self.next_due.values()) if due <= time.time()),
+            # None until the first browser check launches the scraper
+            'browser_pool': self._scraper.get_status() if self._scraper else None,
+            'admission': self.admission.get_status(),
+            'work_queue': self.work_queue.get_status(),
+            'domains': self.domain_health.get_status(),
+            'stages': summarize_stages(snapshot),
+            'metrics': snapshot
+        }
+
+
+def create_tracker(db: Database = None) -> StockTracker:
+    """Create a StockTracker configured from environment variables"""
+    db = db or Database()
+    # For low-resource environments (1 CPU, 1GB RAM), use only 1 concurrent check
+    # This prevents multiple browser instances from overwhelming the system
+    max_concurrent = int(os.environ.get('MAX_CONCURRENT_CHECKS', '1'))
+    check_interval = int(os.environ.get('CHECK_INTERVAL', '60'))  # Default to 60s for low resources
+    # 'distributed' shares items with other tracker nodes through the database
+    work_queue = create_work_queue(
+        os.environ.get('TRACKER_MODE', 'local'),
+        db,
+        node_id=os.environ.get('NODE_ID') or None,
+        lease_ttl=int(os.environ.get('LEASE_TTL', '30'))
+    )
+    domain_health = DomainHealth(
+        failure_threshold=int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', '3')),
+        base_backoff=int(os.environ.get('CIRCUIT_BASE_BACKOFF', '60')),
+        max_backoff=int(os.environ.get('CIRCUIT_MAX_BACKOFF', '3600'))
+    )
+    # With admission control MAX_CONCURRENT_CHECKS is a ceiling, not a fixed setting
+    admission = AdmissionController(
+        max_concurrent,
+        enabled=os.environ.get('ADMISSION_CONTROL', 'true').lower() == 'true',
+        reserve_mb=int(os.environ.get('ADMISSION_RESERVE_MB', '150')),
+        browser_mb=int(os.environ.get('ADMISSION_BROWSER_MB', '250')),
+        max_load=float(os.environ.get('ADMISSION_MAX_LOAD', '1.5'))
+    )
+    return StockTracker(
+        check_interval=check_interval,
+        max_concurrent_checks=max_concurrent,
+        work_queue=work_queue,
+        db=db,
+        domain_health=domain_health,
+        admission=admission,
+        browser_mode=os.environ.get('BROWSER_MODE', 'process'),
+        snapshot_retention=int(os.environ.get('SNAPSHOT_RETENTION', '50')),
+        snapshot_archive_interval=int(os.environ.get('SNAPSHOT_ARCHIVE_INTERVAL', '3600')),
+        warmup_window=int(os.environ['WARMUP_WINDOW']) if os.environ.get('WARMUP_WINDOW') else None,
+        scraper_backend=os.environ.get('SCRAPER_BACKEND', 'selenium')
+    )
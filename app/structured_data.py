@@ -0,0 +1,118 @@
+import json
+import re
+from typing import Dict, Iterator, List, Optional
+
+# schema.org ItemAvailability values, normalised (lowercase, letters only)
+AVAILABLE_VALUES = {'instock', 'limitedavailability', 'onlineonly', 'instoreonly', 'preorder', 'presale', 'backorder'}
+UNAVAILABLE_VALUES = {'outofstock', 'soldout', 'discontinued'}
+
+# Boolean stock flags commonly found in embedded page state (Next.js, Shopify, ...)
+STOCK_FLAG_KEYS = {'instock', 'isinstock', 'availableforsale', 'isavailable', 'isavailableforsale'}
+# String stock fields, e.g. Magento's stock_status: "IN_STOCK"
+STOCK_STATUS_KEYS = {'availability', 'stockstatus', 'stockavailability', 'inventorystatus'}
+
+JSON_LD_RE = re.compile(
+    r'<script[^>]*type\s*=\s*["\']application/ld\+json["\'][^>]*>(.*?)</script>', re.IGNORECASE | re.DOTALL)
+JSON_SCRIPT_RE = re.compile(
+    r'<script[^>]*type\s*=\s*["\']application/json["\'][^>]*>(.*?)</script>', re.IGNORECASE | re.DOTALL)
+MICRODATA_RE = re.compile(r'<[a-z]+\b[^>]*\bitemprop\s*=\s*["\']availability["\'][^>]*>', re.IGNORECASE)
+ATTRIBUTE_RE = re.compile(r'\b(content|href)\s*=\s*["\']([^"\']*)["\']', re.IGNORECASE)
+
+
+def _normalise(value: str) -> str:
+    # "https://schema.org/InStock", "InStock" and "IN_STOCK" all become "instock"
+    return re.sub(r'[^a-z]', '', value.rsplit('/', 1)[-1].lower())
+
+
+def availability_value(value) -> Optional[bool]:
+    """True/False for a recognised availability value, None otherwise"""
+    if isinstance(value, bool):
+        return value
+    if not isinstance(value, str):
+        return None
+    value = _normalise(value)
+    if value in AVAILABLE_VALUES:
+        return True
+    if value in UNAVAILABLE_VALUES:
+        return False
+    return None
+
+
+def _walk(node) -> Iterator[Dict]:
+    """Every dict nested anywhere in a JSON document"""
+    stack = [node]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            yield node
+            stack.extend(node.values())
+        elif isinstance(node, list):
+            stack.extend(node)
+
+
+def _json_documents(pattern: re.Pattern, html: str) -> Iterator:
+    for match in pattern.finditer(html):
+        try:
+            yield json.loads(match.group(1).strip(), strict=False)
+        except ValueError:
+            # Broken JSON blocks are common; skip them rather than fail the check
+            continue
+
+
+def _json_ld(html: str) -> List[bool]:
+    values = []
+    for document in _json_documents(JSON_LD_RE, html):
+        for node in _walk(document):
+            for key, value in node.items():
+                if key.lower() == 'availability':
+                    found = availability_value(value)
+                    if found is not None:
+                        values.append(found)
+    return values
+
+
+def _microdata(html: str) -> List[bool]:
+    values = []
+    for tag in MICRODATA_RE.finditer(html):
+        for _, value in ATTRIBUTE_RE.findall(tag.group(0)):
+            found = availability_value(value)
+            if found is not None:
+                values.append(found)
+                break
+    return values
+
+
+def _embedded_state(html: str) -> List[bool]:
+    values = []
+    for document in _json_documents(JSON_SCRIPT_RE, html):
+        for node in _walk(document):
+            for key, value in node.items():
+                key = key.lower().replace('_', '')
+                if key in STOCK_FLAG_KEYS and isinstance(value, bool):
+                    values.append(value)
+                elif key in STOCK_STATUS_KEYS and isinstance(value, str):
+                    found = availability_value(value)
+                    if found is not None:
+                        values.append(found)
+    return values
+
+
+SOURCES = (('json-ld', _json_ld), ('microdata', _microdata), ('embedded-state', _embedded_state))
+
+
+def extract_availability(html: str) -> Optional[Dict]:
+    """
+    Read stock state from machine-readable data in a page.
+
+    Sources are tried in order: schema.org JSON-LD (offers.availability),
+    schema.org microdata (itemprop="availability") and JSON state embedded
+    in <script type="application/json"> tags such as __NEXT_DATA__. The
+    first source with a recognised value decides; a page listing several
+    offers (variants, sellers) is available if any of them is.
+    Returns None when the page declares no availability at all.
+    """
+    for source, extract in SOURCES:
+        values = extract(html)
+        if values:
+            return {'is_available': any(values), 'source': source, 'values': len(values)}
+    return None
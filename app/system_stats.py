@@ -0,0 +1,101 @@
+import os
+from typing import List, Optional
+
+try:
+    import psutil
+except ImportError:  # Optional: fall back to reading /proc directly (Linux only)
+    psutil = None
+
+
+def _child_pids(pid: int) -> List[int]:
+    """All descendants of pid, read from /proc"""
+    children = {}
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # The command name may contain spaces, so split after its closing paren
+                fields = f.read().rsplit(')', 1)[1].split()
+            children.setdefault(int(fields[1]), []).append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+
+    descendants = []
+    stack = [pid]
+    while stack:
+        for child in children.get(stack.pop(), []):
+            descendants.append(child)
+            stack.append(child)
+    return descendants
+
+
+def _rss_bytes(pid: int) -> int:
+    try:
+        with open(f'/proc/{pid}/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, IndexError, ValueError):
+        return 0
+
+
+def process_tree_rss(pid: Optional[int] = None, name_filter: Optional[str] = None) -> int:
+    """
+    Resident memory in bytes of a process and all its descendants.
+
+    Browsers launched by Selenium (chromedriver, chrome and its renderer and
+    GPU processes) are children of this process, so the tree total is what
+    the checks really cost. With name_filter only processes whose name
+    contains it are counted.
+    """
+    pid = pid or os.getpid()
+    if psutil:
+        try:
+            root = psutil.Process(pid)
+            processes = [root] + root.children(recursive=True)
+        except psutil.Error:
+            return 0
+        total = 0
+        for process in processes:
+            try:
+                if name_filter and name_filter not in process.name().lower():
+                    continue
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+        return total
+
+    if not os.path.isdir('/proc'):
+        return 0
+    total = 0
+    for tree_pid in [pid] + _child_pids(pid):
+        if name_filter:
+            try:
+                with open(f'/proc/{tree_pid}/comm') as f:
+                    if name_filter not in f.read().lower():
+                        continue
+            except OSError:
+                continue
+        total += _rss_bytes(tree_pid)
+    return total
+
+
+def available_memory() -> Optional[int]:
+    """Memory in bytes available to new processes without swapping, None if unknown"""
+    if psutil:
+        return psutil.virtual_memory().available
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def load_per_cpu() -> Optional[float]:
+    """One-minute load average divided by the number of CPUs, None if unknown"""
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1)
+    except (AttributeError, OSError):
+        return None
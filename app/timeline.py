@@ -0,0 +1,163 @@
+import threading
+import time
+from array import array
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+WINDOWS = {'24h': 24 * 3600, '7d': 7 * 24 * 3600}
+RETENTION_SECONDS = max(WINDOWS.values())
+# History rows read per query when catching up
+TAIL_BATCH = 10000
+
+
+def history_timestamp(value: str) -> float:
+    """availability_history.checked_at (SQLite CURRENT_TIMESTAMP, UTC) as epoch seconds"""
+    return datetime.strptime(value, '%Y-%m-%d %H:%M:%S').replace(tzinfo=timezone.utc).timestamp()
+
+
+def format_timestamp(timestamp: Optional[float]) -> Optional[str]:
+    """Epoch seconds in the UTC format the other endpoints return"""
+    if not timestamp:
+        return None
+    return datetime.fromtimestamp(timestamp, timezone.utc).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class ItemTimeline:
+    """
+    Availability transitions of one item, oldest first.
+
+    Only changes are stored, as parallel arrays of timestamps and states
+    (a few bytes each), plus the time of the latest check. Transitions older
+    than the retention period are dropped, except the last one before it,
+    which gives the state at the start of the longest window. At most
+    max_transitions are kept.
+    """
+
+    def __init__(self, max_transitions: int = 512):
+        self.max_transitions = max_transitions
+        self.times = array('d')
+        self.states = array('b')
+        self.last_checked: Optional[float] = None
+
+    def record(self, timestamp: float, is_available: bool):
+        if self.last_checked is None or timestamp > self.last_checked:
+            self.last_checked = timestamp
+        if self.states and self.states[-1] == int(is_available):
+            return
+        if self.times and timestamp < self.times[-1]:
+            # Out-of-order results (several nodes) only refresh last_checked
+            return
+        self.times.append(timestamp)
+        self.states.append(int(is_available))
+        self._prune(timestamp)
+
+    def _prune(self, now: float):
+        cutoff = now - RETENTION_SECONDS
+        drop = 0
+        while drop + 1 < len(self.times) and self.times[drop + 1] <= cutoff:
+            drop += 1
+        drop = max(drop, len(self.times) - self.max_transitions)
+        if drop > 0:
+            del self.times[:drop]
+            del self.states[:drop]
+
+    def summary(self, window: float, buckets: int, now: float) -> Dict:
+        """
+        Uptime and a sparkline for the last `window` seconds.
+
+        Each sparkline bucket is the fraction of its known time the item was
+        available (None before the first recorded check); uptime is the same
+        over the whole window.
+        """
+        start = now - window
+        bucket_size = window / buckets
+        available = [0.0] * buckets
+        known = [0.0] * buckets
+        transitions = 0
+
+        for index in range(len(self.times)):
+            segment_start = max(self.times[index], start)
+            segment_end = self.times[index + 1] if index + 1 < len(self.times) else now
+            if self.times[index] >= start and index > 0:
+                transitions += 1
+            if segment_end <= segment_start:
+                continue
+            first = int((segment_start - start) // bucket_size)
+            last = min(int((segment_end - start) // bucket_size), buckets - 1)
+            for bucket in range(first, last + 1):
+                bucket_start = start + bucket * bucket_size
+                overlap = min(segment_end, bucket_start + bucket_size) - max(segment_start, bucket_start)
+                if overlap > 0:
+                    known[bucket] += overlap
+                    if self.states[index]:
+                        available[bucket] += overlap
+
+        total_known = sum(known)
+        return {
+            'uptime': round(sum(available) / total_known, 4) if total_known else None,
+            'sparkline': [round(available[b] / known[b], 2) if known[b] else None for b in range(buckets)],
+            'transitions': transitions,
+        }
+
+
+class AvailabilityTimelines:
+    """
+    Timelines of every item, kept in memory for the dashboard.
+
+    Built once from availability_history (only transitions are read, through
+    the (item_id, checked_at) index) and then kept current by tailing the
+    table by id, so each refresh reads only the checks recorded since the
+    previous one. This works the same whether checks run in this process or
+    in external workers.
+    """
+
+    def __init__(self, db):
+        self.db = db
+        self.timelines: Dict[int, ItemTimeline] = {}
+        self.last_history_id: Optional[int] = None
+        self.lock = threading.Lock()
+
+    def _timeline(self, item_id: int) -> ItemTimeline:
+        timeline = self.timelines.get(item_id)
+        if timeline is None:
+            timeline = self.timelines[item_id] = ItemTimeline()
+        return timeline
+
+    def sync(self):
+        """Load the history on first use, then apply checks recorded since the last sync"""
+        with self.lock:
+            if self.last_history_id is None:
+                since = time.time() - RETENTION_SECONDS
+                transitions, last_checks, self.last_history_id = self.db.get_availability_transitions(since)
+                for row in transitions:
+                    self._timeline(row['item_id']).record(history_timestamp(row['checked_at']),
+                                                          bool(row['is_available']))
+                for item_id, checked_at in last_checks.items():
+                    timeline = self._timeline(item_id)
+                    timeline.last_checked = max(timeline.last_checked or 0, history_timestamp(checked_at))
+                return
+
+            while True:
+                rows = self.db.get_availability_history_after(self.last_history_id, limit=TAIL_BATCH)
+                for row in rows:
+                    self._timeline(row['item_id']).record(history_timestamp(row['checked_at']),
+                                                          bool(row['is_available']))
+                    self.last_history_id = row['id']
+                if len(rows) < TAIL_BATCH:
+                    return
+
+    def forget(self, item_id: int):
+        with self.lock:
+            self.timelines.pop(item_id, None)
+
+    def summaries(self, buckets: int = 48, now: float = None) -> Dict[int, Dict]:
+        """Uptime and sparklines of every item for each window in WINDOWS"""
+        now = now or time.time()
+        with self.lock:
+            result = {}
+            for item_id, timeline in self.timelines.items():
+                summary = {name: timeline.summary(window, buckets, now) for name, window in WINDOWS.items()}
+                summary['last_change'] = format_timestamp(timeline.times[-1] if timeline.times else None)
+                summary['last_checked'] = format_timestamp(timeline.last_checked)
+                result[item_id] = summary
+            return result
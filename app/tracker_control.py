@@ -0,0 +1,187 @@
+import threading
+import time
+from datetime import datetime
+from typing import Callable, Dict, List, Optional
+
+from app.models import Database
+from app.profiler import ProfilerBusy, run_diagnostic
+
+
+class ControlChannel:
+    """
+    Worker side of the control channel.
+
+    Polls the tracker_commands table for commands queued by the web app,
+    runs them against the local tracker and periodically publishes the
+    tracker status to the tracker_status table.
+    """
+
+    def __init__(self, tracker, db: Database, poll_interval: float = 1.0, status_interval: float = 5.0):
+        self.tracker = tracker
+        self.db = db
+        self.node_id = tracker.work_queue.node_id
+        self.poll_interval = poll_interval
+        self.status_interval = status_interval
+        self.handlers: Dict[str, Callable[[Dict], Dict]] = {
+            'force_check': self._handle_force_check,
+            'diagnostic': self._handle_diagnostic,
+        }
+        # Long-running commands get their own thread so force checks aren't held up
+        self.background_commands = {'diagnostic'}
+        self.running = False
+        self.thread = None
+        self._stop_event = threading.Event()
+
+    def register_handler(self, command: str, handler: Callable[[Dict], Dict]):
+        """Register a handler returning a JSON-serialisable result for a command"""
+        self.handlers[command] = handler
+
+    def start(self):
+        if not self.running:
+            self.running = True
+            self._stop_event.clear()
+            self.thread = threading.Thread(target=self._run, daemon=True, name="ControlChannel")
+            self.thread.start()
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Control channel started for node {self.node_id}")
+
+    def stop(self):
+        if self.running:
+            self.running = False
+            self._stop_event.set()
+            if self.thread:
+                self.thread.join()
+            try:
+                self.db.remove_tracker_status(self.node_id)
+            except Exception as e:
+                print(f"Error removing tracker status: {str(e)}")
+
+    def _run(self):
+        last_status = 0
+        while not self._stop_event.is_set():
+            try:
+                if time.time() - last_status >= self.status_interval:
+                    self.db.publish_tracker_status(self.node_id, self.tracker.get_status())
+                    last_status = time.time()
+
+                for command in self.db.claim_tracker_commands(self.node_id):
+                    self._dispatch(command)
+            except Exception as e:
+                print(f"Error in control channel: {str(e)}")
+            self._stop_event.wait(self.poll_interval)
+
+    def _dispatch(self, command: Dict):
+        handler = self.handlers.get(command['command'])
+        if handler is None:
+            self.db.complete_tracker_command(command['id'], {'error': f"Unknown command: {command['command']}"}, failed=True)
+            return
+        if command['command'] in self.background_commands:
+            threading.Thread(target=self._execute, args=(handler, command), daemon=True,
+                             name=f"Command-{command['id']}").start()
+        else:
+            self._execute(handler, command)
+
+    def _execute(self, handler: Callable[[Dict], Dict], command: Dict):
+        try:
+            result = handler(command)
+            self.db.complete_tracker_command(command['id'], result)
+        except Exception as e:
+            print(f"Error running command {command['command']}: {str(e)}")
+            # The kind lets the web process answer with the same status as in-process mode
+            kind = 'busy' if isinstance(e, ProfilerBusy) else 'invalid' if isinstance(e, ValueError) else 'error'
+            self.db.complete_tracker_command(command['id'], {'error': str(e), 'kind': kind}, failed=True)
+
+    def _handle_force_check(self, command: Dict) -> Dict:
+        return {'queued': self.tracker.force_check_item(command['item_id'])}
+
+    def _handle_diagnostic(self, command: Dict) -> Dict:
+        payload = command['payload']
+        return run_diagnostic(payload['action'], payload.get('options', {}))
+
+
+class TrackerClient:
+    """
+    Web side of the control channel.
+
+    Stands in for StockTracker in the web process when the tracker runs in
+    separate worker processes (TRACKER_PROCESS=external), so the web app
+    never imports Selenium. Commands go through the database.
+    """
+
+    def __init__(self, db: Database, stale_after: float = 15.0):
+        self.db = db
+        self.stale_after = stale_after
+
+    def start(self):
+        """Workers are started separately with worker.py"""
+        pass
+
+    def stop(self):
+        pass
+
+    def _worker_statuses(self) -> List[Dict]:
+        return self.db.get_tracker_statuses(stale_after=self.stale_after)
+
+    @property
+    def running(self) -> bool:
+        return any(status.get('running') for status in self._worker_statuses())
+
+    @property
+    def check_interval(self) -> Optional[int]:
+        statuses = self._worker_statuses()
+        return statuses[0].get('check_interval') if statuses else None
+
+    def force_check_item(self, item_id: int) -> bool:
+        """Queue a force check for whichever worker picks it up first"""
+        if not self.db.get_item(item_id):
+            return False
+        self.db.add_tracker_command('force_check', item_id=item_id)
+        return True
+
+    def run_command(self, command: str, payload: Dict = None, timeout: float = 30.0) -> Optional[Dict]:
+        """Queue a command and wait for a worker to finish it; None on timeout"""
+        command_id = self.db.add_tracker_command(command, payload=payload)
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            result = self.db.get_tracker_command(command_id)
+            if result and result['status'] in ('done', 'failed'):
+                return result
+            time.sleep(0.5)
+        return None
+
+    def run_diagnostic(self, action: str, options: Dict) -> Dict:
+        """Run a profiler diagnostic inside a worker process"""
+        timeout = float(options.get('seconds', 0)) + 15 if action == 'profile' else 15
+        result = self.run_command('diagnostic', {'action': action, 'options': options}, timeout=timeout)
+        if result is None:
+            raise TimeoutError("No tracker worker answered in time")
+        if result['status'] == 'failed':
+            error = result['result'].get('error', 'Diagnostic failed')
+            kind = result['result'].get('kind')
+            if kind == 'busy':
+                raise ProfilerBusy(error)
+            if kind == 'invalid':
+                raise ValueError(error)
+            raise RuntimeError(error)
+        return {**result['result'], 'node_id': result['node_id']}
+
+    def get_domain_health(self) -> List[Dict]:
+        """Domain circuit breaker stats reported by every worker"""
+        domains = []
+        for status in self._worker_statuses():
+            for domain in status.get('domains', []):
+                domains.append({**domain, 'node_id': status['node_id']})
+        return domains
+
+    def get_metrics(self) -> List:
+        """Metric snapshots published by each worker, labelled with its node"""
+        return [({'node': status['node_id']}, status['metrics'])
+                for status in self._worker_statuses() if status.get('metrics')]
+
+    def get_status(self) -> Dict:
+        statuses = self._worker_statuses()
+        return {
+            'running': any(status.get('running') for status in statuses),
+            'check_interval': statuses[0].get('check_interval') if statuses else None,
+            'process': 'external',
+            'workers': statuses
+        }
@@ -0,0 +1,142 @@
+import os
+import socket
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, List, Set
+
+from app.models import Database
+
+
+# A work queue backend decides which items this tracker schedules. Backends
+# implement start(), stop(), owned_items(items), owns(item_id) and
+# get_status(); create_work_queue picks one from TRACKER_MODE. A backend over
+# a store shared between machines (a database server, Redis, ...) can be
+# added there without touching the tracker.
+
+
+class LocalWorkQueue:
+    """Single-node stand-in: this process owns every item"""
+
+    def __init__(self):
+        self.node_id = f"{socket.gethostname()}-{os.getpid()}"
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def owned_items(self, items: List[Dict]) -> List[Dict]:
+        """Filter items down to the ones this node should schedule"""
+        return items
+
+    def owns(self, item_id: int) -> bool:
+        return True
+
+    def get_status(self) -> Dict:
+        return {'mode': 'local', 'node_id': self.node_id}
+
+
+class SQLiteLeaseQueue:
+    """
+    Shares items between tracker nodes through leases in the SQLite database.
+
+    Each node heartbeats every lease_ttl / 3 seconds, renewing its leases and
+    rebalancing to a fair share of the items. When a node crashes its
+    heartbeat stops, its leases expire after lease_ttl and the remaining nodes
+    claim the orphaned items on their next heartbeat.
+
+    All nodes must run on the same host as the database file: SQLite's WAL
+    mode needs shared memory, and its file locking is unreliable over network
+    filesystems, so nodes on other machines would break the lease
+    transactions or corrupt the database.
+    """
+
+    def __init__(self, db: Database, node_id: str = None, lease_ttl: int = 30):
+        self.db = db
+        self.hostname = socket.gethostname()
+        self.node_id = node_id or f"{self.hostname}-{os.getpid()}-{str(uuid.uuid4())[:4]}"
+        self.lease_ttl = lease_ttl
+        self.heartbeat_interval = max(lease_ttl / 3, 1)
+        self.owned_item_ids: Set[int] = set()
+        self.foreign_hosts: Set[str] = set()
+        self.running = False
+        self.thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """Register this node and start the heartbeat thread"""
+        if not self.running:
+            self.running = True
+            self._stop_event.clear()
+            self._heartbeat()
+            self.thread = threading.Thread(target=self._heartbeat_loop, daemon=True, name="LeaseHeartbeat")
+            self.thread.start()
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Node {self.node_id} joined, holding {len(self.owned_item_ids)} items")
+
+    def stop(self):
+        """Stop heartbeating and release all leases so other nodes take over immediately"""
+        if self.running:
+            self.running = False
+            self._stop_event.set()
+            if self.thread:
+                self.thread.join()
+            try:
+                self.db.remove_node(self.node_id)
+            except Exception as e:
+                print(f"Error releasing leases for node {self.node_id}: {str(e)}")
+            self.owned_item_ids = set()
+
+    def _heartbeat(self):
+        self.db.heartbeat_node(self.node_id, self.hostname, os.getpid())
+        owned = set(self.db.sync_item_leases(self.node_id, self.lease_ttl, stale_after=self.lease_ttl))
+        if owned != self.owned_item_ids:
+            gained = len(owned - self.owned_item_ids)
+            lost = len(self.owned_item_ids - owned)
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Node {self.node_id} leases: {len(owned)} items (+{gained}/-{lost})")
+        self.owned_item_ids = owned
+        self._check_hosts()
+
+    def _check_hosts(self):
+        """Warn about nodes on other hosts sharing the database, which SQLite can't support"""
+        hosts = {node['hostname'] for node in self.db.get_active_nodes(stale_after=self.lease_ttl)}
+        foreign = hosts - {self.hostname}
+        if foreign - self.foreign_hosts:
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] WARNING: nodes on other hosts "
+                  f"({', '.join(sorted(foreign))}) share this SQLite database; distributed mode only "
+                  f"works between processes on one host")
+        self.foreign_hosts = foreign
+
+    def _heartbeat_loop(self):
+        while not self._stop_event.wait(self.heartbeat_interval):
+            try:
+                self._heartbeat()
+            except Exception as e:
+                # Keep trying; if this persists our leases expire and other nodes take over
+                print(f"Error in lease heartbeat: {str(e)}")
+
+    def owned_items(self, items: List[Dict]) -> List[Dict]:
+        """Filter items down to the ones this node currently holds a lease on"""
+        return [item for item in items if item['id'] in self.owned_item_ids]
+
+    def owns(self, item_id: int) -> bool:
+        return item_id in self.owned_item_ids
+
+    def get_status(self) -> Dict:
+        return {
+            'mode': 'distributed',
+            'node_id': self.node_id,
+            'lease_ttl': self.lease_ttl,
+            'owned_items': len(self.owned_item_ids),
+            'nodes': self.db.get_active_nodes(stale_after=self.lease_ttl),
+        }
+
+
+def create_work_queue(mode: str, db: Database, node_id: str = None, lease_ttl: int = 30):
+    """Create the work queue backend for the given TRACKER_MODE"""
+    if mode == 'distributed':
+        return SQLiteLeaseQueue(db, node_id=node_id, lease_ttl=lease_ttl)
+    if mode == 'local':
+        return LocalWorkQueue()
+    raise ValueError(f"Unknown tracker mode: {mode}")
@@ -0,0 +1 @@
+# Benchmarks for the check pipeline; run from the repository root, e.g. python -m benchmarks.micro
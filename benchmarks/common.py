@@ -0,0 +1,49 @@
+import json
+import math
+import os
+import platform
+import subprocess
+from datetime import datetime
+from typing import Dict, List
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+
+def git_revision() -> str:
+    """Short commit hash of the working tree, with a marker if it has local changes"""
+    try:
+        revision = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], text=True,
+                                           stderr=subprocess.DEVNULL).strip()
+        dirty = subprocess.call(['git', 'diff', '--quiet', 'HEAD'], stderr=subprocess.DEVNULL) != 0
+        return f"{revision}-dirty" if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def percentile(values: List[float], quantile: float) -> float:
+    """Nearest-rank percentile; 0.0 for an empty list"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, math.ceil(quantile * len(ordered)) - 1))
+    return ordered[index]
+
+
+def save_results(suite: str, results: Dict, params: Dict) -> str:
+    """Write results to benchmarks/results/<suite>-<timestamp>-<revision>.json"""
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    revision = git_revision()
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    path = os.path.join(RESULTS_DIR, f"{suite}-{timestamp}-{revision}.json")
+    with open(path, 'w') as f:
+        json.dump({
+            'suite': suite,
+            'revision': revision,
+            'timestamp': datetime.now().isoformat(),
+            'python': platform.python_version(),
+            'machine': platform.platform(),
+            'params': params,
+            'results': results,
+        }, f, indent=2)
+    print(f"Results saved to {path}")
+    return path
@@ -0,0 +1,46 @@
+"""
+Compare two saved benchmark results.
+
+Usage (from the repository root):
+    python -m benchmarks.compare benchmarks/results/micro-A.json benchmarks/results/micro-B.json
+"""
+import argparse
+import json
+from typing import Dict
+
+
+def flatten(results: Dict, prefix: str = '') -> Dict[str, float]:
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + '.'))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare two benchmark result files")
+    parser.add_argument('baseline')
+    parser.add_argument('candidate')
+    args = parser.parse_args()
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    with open(args.candidate) as f:
+        candidate = json.load(f)
+
+    if baseline['params'] != candidate['params']:
+        print(f"Warning: parameters differ: {baseline['params']} vs {candidate['params']}")
+
+    print(f"{'metric':60} {baseline['revision']:>14} {candidate['revision']:>14} {'change':>9}")
+    before = flatten(baseline['results'])
+    after = flatten(candidate['results'])
+    for name in sorted(before.keys() & after.keys()):
+        change = f"{(after[name] - before[name]) / before[name] * 100:+.1f}%" if before[name] else ''
+        print(f"{name:60} {before[name]:>14.6g} {after[name]:>14.6g} {change:>9}")
+
+
+if __name__ == '__main__':
+    main()
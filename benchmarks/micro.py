@@ -0,0 +1,95 @@
+"""
+Microbenchmarks for the hot parts of a check that don't need a browser.
+
+- rule matching: evaluate_rule over small, medium and large synthetic pages
+- history writes: Database.update_item_availability against a fresh database
+
+Usage (from the repository root):
+    python -m benchmarks.micro [--repeat 5]
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable, Dict
+
+from app.models import Database
+from app.rules import evaluate_rule
+from benchmarks.common import percentile, save_results
+from benchmarks.retail_server import PAGE_SIZES, RetailServer
+
+RULE_PATTERNS = {
+    'literal': 'out of stock',
+    'alternation': 'out of stock|unavailable|sold out',
+    'wildcard': 'stock.*0',
+}
+
+
+def time_calls(func: Callable[[], None], repeat: int, number: int) -> Dict:
+    """Run func number times per round for repeat rounds; report per-call seconds"""
+    rounds = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for _ in range(number):
+            func()
+        rounds.append((time.perf_counter() - started) / number)
+    return {
+        'best_seconds': min(rounds),
+        'median_seconds': percentile(rounds, 0.5),
+        'calls_per_second': round(1 / min(rounds), 1) if min(rounds) else None,
+    }
+
+
+def bench_rule_matching(repeat: int) -> Dict:
+    # Render pages with the retail stand-in so sizes match the pipeline benchmark
+    server = RetailServer()
+    server.httpd.server_close()
+    results = {}
+    for size_index, size in enumerate(PAGE_SIZES):
+        # product_profile picks the size from product_id % len(PAGE_SIZES)
+        product_id = len(PAGE_SIZES) + size_index
+        page = server.render_product(product_id) + 'Out of stock'
+        for name, pattern in RULE_PATTERNS.items():
+            number = max(1, 2_000_000 // size)
+            timing = time_calls(lambda: evaluate_rule(page, pattern, 1), repeat, number)
+            timing['page_bytes'] = len(page)
+            results[f"{name}_{size // 1024}kb"] = timing
+    return results
+
+
+def bench_history_writes(repeat: int, writes: int = 500) -> Dict:
+    workdir = tempfile.mkdtemp(prefix='stock-tracker-micro-')
+    db = Database(os.path.join(workdir, 'micro.db'))
+    item_ids = [db.add_item(f"http://localhost/product/{i}", f"Product {i}", 'out of stock', 1) for i in range(20)]
+    counter = iter(range(10 ** 9))
+
+    def write():
+        n = next(counter)
+        db.update_item_availability(item_ids[n % len(item_ids)], n % 3 == 0)
+
+    results = {'update_item_availability': time_calls(write, repeat, writes)}
+    db_bytes = sum(os.path.getsize(p) for p in (db.db_path, db.db_path + '-wal') if os.path.exists(p))
+    results['db_bytes_per_write'] = round(db_bytes / (repeat * writes), 1)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run rule matching and history write microbenchmarks")
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--no-save', action='store_true', help="Print results without saving them")
+    args = parser.parse_args()
+
+    results = {
+        'rule_matching': bench_rule_matching(args.repeat),
+        'history_writes': bench_history_writes(args.repeat),
+    }
+    for group, entries in results.items():
+        print(group)
+        for name, value in entries.items():
+            print(f"  {name:32} {value}")
+    if not args.no_save:
+        save_results('micro', results, {'repeat': args.repeat})
+
+
+if __name__ == '__main__':
+    main()
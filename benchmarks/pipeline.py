@@ -0,0 +1,193 @@
+"""
+End-to-end check pipeline benchmark.
+
+Drives the real StockTracker (scheduler, workers, SeleniumScraper, Database)
+against the local retail stand-in and reports:
+
+- checks/sec and error count
+- p50/p99 check latency
+- detection delay between a stock flip on the server and the tracker
+  recording the new state
+- peak RSS of this process plus all children (chromedriver, Chrome)
+- database growth
+
+Usage (from the repository root, needs Chrome and chromedriver):
+    python -m benchmarks.pipeline --items 20 --workers 2 --duration 120
+"""
+import argparse
+import os
+import tempfile
+import threading
+import time
+from typing import Dict, List
+
+from app.models import Database
+from app.stock_tracker import StockTracker
+from app.system_stats import process_tree_rss
+from benchmarks.common import percentile, save_results
+from benchmarks.retail_server import RetailServer
+
+
+class RecordingDatabase(Database):
+    """Database that remembers when each availability update was written"""
+
+    def __init__(self, *args, **kwargs):
+        self.updates: List = []
+        self.updates_lock = threading.Lock()
+        super().__init__(*args, **kwargs)
+
+    def update_item_availability(self, item_id: int, is_available: bool):
+        super().update_item_availability(item_id, is_available)
+        with self.updates_lock:
+            self.updates.append((item_id, is_available, time.time()))
+
+
+class TimedTracker(StockTracker):
+    """StockTracker that records the wall time of every item check"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.check_latencies: List[float] = []
+
+    def _check_item(self, item: Dict, force: bool = False):
+        started = time.perf_counter()
+        try:
+            super()._check_item(item, force=force)
+        finally:
+            self.check_latencies.append(time.perf_counter() - started)
+
+
+class RssSampler:
+    """Samples the RSS of this process tree in the background and keeps the peak"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.peak = 0
+        self._stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True, name="RssSampler")
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            self.peak = max(self.peak, process_tree_rss())
+            self._stop_event.wait(self.interval)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self._stop_event.set()
+        self.thread.join()
+
+
+def db_size(db: Database) -> int:
+    """Size of the database file after folding the WAL back into it"""
+    with db.get_connection() as conn:
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    return os.path.getsize(db.db_path)
+
+
+def detection_delays(server: RetailServer, updates: List, item_products: Dict[int, int], until: float):
+    """Seconds from each stock flip to the first recorded update showing the new state"""
+    by_item: Dict[int, List] = {}
+    for item_id, is_available, recorded_at in updates:
+        by_item.setdefault(item_id, []).append((recorded_at, is_available))
+
+    delays = []
+    missed = 0
+    for item_id, product_id in item_products.items():
+        records = by_item.get(item_id, [])
+        for flip_at in server.flip_times(product_id, until):
+            new_state = server.in_stock(product_id, flip_at + 0.001)
+            detected = next((recorded_at for recorded_at, is_available in records
+                             if recorded_at >= flip_at and is_available == new_state), None)
+            if detected is None:
+                missed += 1
+            else:
+                delays.append(detected - flip_at)
+    return delays, missed
+
+
+def run(items: int, workers: int, duration: float, check_interval: int, flip_interval: float) -> Dict:
+    workdir = tempfile.mkdtemp(prefix='stock-tracker-bench-')
+    db_path = os.path.join(workdir, 'bench.db')
+
+    server = RetailServer(flip_interval=flip_interval)
+    server.start()
+
+    db = RecordingDatabase(db_path)
+    item_products = {}
+    for product_id in range(1, items + 1):
+        item_id = db.add_item(server.product_url(product_id), f"Product {product_id}", 'out of stock', 1)
+        item_products[item_id] = product_id
+    db_size_before = db_size(db)
+
+    # Page source logs go to the working directory
+    previous_cwd = os.getcwd()
+    os.chdir(workdir)
+
+    sampler = RssSampler()
+    sampler.start()
+    tracker = TimedTracker(check_interval=check_interval, max_concurrent_checks=workers, db=db)
+    started = time.time()
+    tracker.start()
+    try:
+        time.sleep(duration)
+    finally:
+        tracker.stop()
+        finished = time.time()
+        if tracker._scraper:
+            tracker._scraper.cleanup()
+        sampler.stop()
+        server.stop()
+        os.chdir(previous_cwd)
+
+    elapsed = finished - started
+    successful = len(db.updates)
+    delays, missed = detection_delays(server, db.updates, item_products, finished - check_interval)
+    return {
+        'elapsed_seconds': round(elapsed, 2),
+        'checks': len(tracker.check_latencies),
+        'successful_checks': successful,
+        'errors': len(tracker.check_latencies) - successful,
+        'checks_per_second': round(successful / elapsed, 3),
+        'latency_p50_seconds': round(percentile(tracker.check_latencies, 0.5), 3),
+        'latency_p99_seconds': round(percentile(tracker.check_latencies, 0.99), 3),
+        'detection_delay_mean_seconds': round(sum(delays) / len(delays), 2) if delays else None,
+        'detection_delay_p50_seconds': round(percentile(delays, 0.5), 2) if delays else None,
+        'detection_delay_p99_seconds': round(percentile(delays, 0.99), 2) if delays else None,
+        'flips_detected': len(delays),
+        'flips_missed': missed,
+        'peak_rss_mb': round(sampler.peak / (1024 * 1024), 1),
+        'db_growth_bytes': db_size(db) - db_size_before,
+        'server_requests': server.requests_served,
+        'stages': tracker.get_status()['stages'],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the check pipeline against a local retail stand-in")
+    parser.add_argument('--items', type=int, default=10)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--duration', type=float, default=120, help="Seconds to run the tracker")
+    parser.add_argument('--check-interval', type=int, default=10)
+    parser.add_argument('--flip-interval', type=float, default=45, help="Seconds between stock flips per product")
+    parser.add_argument('--no-save', action='store_true', help="Print results without saving them")
+    args = parser.parse_args()
+
+    params = {
+        'items': args.items,
+        'workers': args.workers,
+        'duration': args.duration,
+        'check_interval': args.check_interval,
+        'flip_interval': args.flip_interval,
+    }
+    results = run(**params)
+    for key, value in results.items():
+        if key != 'stages':
+            print(f"{key:32} {value}")
+    if not args.no_save:
+        save_results('pipeline', results, params)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Local retail stand-in for benchmarks.
+
+Serves synthetic product pages at /product/<id>. Each product gets a fixed
+profile derived from its id:
+
+- page size: small (~10 KB), medium (~200 KB) or large (~2 MB) of filler markup
+- stock text written into the page by JavaScript after load (even ids) or
+  present in the HTML itself (odd ids)
+- slow responses (every fifth id waits SLOW_DELAY seconds before answering)
+
+Stock state flips every flip_interval seconds, with a per-product offset so
+flips are spread out. Out-of-stock pages contain "Out of stock", which the
+benchmark rule (pattern "out of stock", count 1) detects.
+"""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+
+PAGE_SIZES = (10 * 1024, 200 * 1024, 2 * 1024 * 1024)
+SLOW_DELAY = 2.0
+FILLER = '<div class="filler"><span>Lorem ipsum dolor sit amet, consectetur adipiscing elit.</span></div>\n'
+
+
+def product_profile(product_id: int) -> Dict:
+    return {
+        'size': PAGE_SIZES[product_id % len(PAGE_SIZES)],
+        'js_rendered': product_id % 2 == 0,
+        'delay': SLOW_DELAY if product_id % 5 == 0 else 0.0,
+    }
+
+
+class RetailServer:
+    """Threaded HTTP server running in the background"""
+
+    def __init__(self, host: str = '127.0.0.1', port: int = 0, flip_interval: float = 30.0):
+        self.flip_interval = flip_interval
+        self.started_at = time.time()
+        self._filler_cache: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self.requests_served = 0
+
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server._handle(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer((host, port), Handler)
+        self.httpd.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def product_url(self, product_id: int) -> str:
+        return f"{self.base_url}/product/{product_id}"
+
+    def start(self):
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True, name="RetailServer")
+        self.thread.start()
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def _offset(self, product_id: int) -> float:
+        # Spread flips of different products over the interval
+        return (product_id * 7.919) % self.flip_interval
+
+    def in_stock(self, product_id: int, at: Optional[float] = None) -> bool:
+        elapsed = (at or time.time()) - self.started_at + self._offset(product_id)
+        return int(elapsed // self.flip_interval) % 2 == 0
+
+    def flip_times(self, product_id: int, until: float) -> List[float]:
+        """Times at which the product's stock state changed, up to until"""
+        times = []
+        k = 1
+        while True:
+            flip_at = self.started_at + k * self.flip_interval - self._offset(product_id)
+            if flip_at > until:
+                return times
+            if flip_at > self.started_at:
+                times.append(flip_at)
+            k += 1
+
+    def _filler(self, size: int) -> str:
+        with self._lock:
+            if size not in self._filler_cache:
+                self._filler_cache[size] = FILLER * (size // len(FILLER) + 1)
+            return self._filler_cache[size]
+
+    def render_product(self, product_id: int) -> str:
+        profile = product_profile(product_id)
+        stock_text = 'In stock - ships today' if self.in_stock(product_id) else 'Out of stock'
+        if profile['js_rendered']:
+            # Text only exists once the script has run, like client-rendered shops.
+            # It is stored reversed so the raw HTML never contains it.
+            stock_html = (
+                '<div id="stock"></div>\n'
+                '<script>setTimeout(function () { document.getElementById("stock").textContent = '
+                f'{json.dumps(stock_text[::-1])}.split("").reverse().join(""); }}, 200);</script>'
+            )
+        else:
+            stock_html = f'<div id="stock">{stock_text}</div>'
+        return (
+            '<!DOCTYPE html><html><head><meta charset="UTF-8">'
+            f'<title>Product {product_id}</title></head><body>\n'
+            f'<h1>Product {product_id}</h1>\n{stock_html}\n'
+            f'{self._filler(profile["size"])}'
+            '</body></html>'
+        )
+
+    def _handle(self, handler: BaseHTTPRequestHandler):
+        parts = handler.path.strip('/').split('/')
+        if len(parts) != 2 or parts[0] != 'product' or not parts[1].isdigit():
+            handler.send_error(404)
+            return
+
+        product_id = int(parts[1])
+        delay = product_profile(product_id)['delay']
+        if delay:
+            time.sleep(delay)
+
+        body = self.render_product(product_id).encode('utf-8')
+        with self._lock:
+            self.requests_served += 1
+        handler.send_response(200)
+        handler.send_header('Content-Type', 'text/html; charset=utf-8')
+        handler.send_header('Content-Length', str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+
+if __name__ == '__main__':
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Serve synthetic product pages")
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--flip-interval', type=float, default=30.0)
+    args = parser.parse_args()
+
+    retail = RetailServer(port=args.port, flip_interval=args.flip_interval)
+    print(f"Serving synthetic products at {retail.base_url}/product/<id>")
+    retail.httpd.serve_forever()
@@ -0,0 +1,447 @@
+import atexit
+import itertools
+import json
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+from queue import Queue, Empty
+from typing import Dict, Optional, Tuple
+
+from app.rules import apply_rule
+from scrapers import errors
+from scrapers.errors import CheckError
+
+# websocket-client is imported when the browser is launched, like Selenium in
+# SeleniumScraper, so importing this module stays cheap.
+
+CHROME_BINARIES = ('google-chrome', 'google-chrome-stable', 'chromium', 'chromium-browser', 'chrome')
+
+CHROME_ARGS = (
+    '--headless=new',
+    '--remote-debugging-port=0',
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--disable-extensions',
+    '--disable-background-networking',
+    '--disable-background-timer-throttling',
+    '--disable-renderer-backgrounding',
+    '--disable-features=TranslateUI',
+    '--disable-blink-features=AutomationControlled',
+    '--disable-logging',
+    '--mute-audio',
+    '--no-first-run',
+    '--js-flags=--max_old_space_size=512',
+    '--user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+    '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+)
+
+# Requests for these are failed in the browser before they hit the network
+BLOCKED_RESOURCE_TYPES = ('Image', 'Media', 'Font')
+
+# Resolves once the DOM has had no mutations for `quiet` ms (capped at `limit` ms),
+# so client-rendered stock text is in place without a fixed sleep
+SETTLE_SCRIPT = '''
+new Promise(resolve => {
+    let timer;
+    const done = () => { observer.disconnect(); resolve(true); };
+    const observer = new MutationObserver(() => { clearTimeout(timer); timer = setTimeout(done, %(quiet)d); });
+    observer.observe(document, {subtree: true, childList: true, characterData: true, attributes: true});
+    timer = setTimeout(done, %(quiet)d);
+    setTimeout(done, %(limit)d);
+})
+'''
+
+# Only the machine-readable parts of the page, for structured rules
+STRUCTURED_SCRIPT = '''
+Array.from(document.querySelectorAll(
+    'script[type="application/ld+json"], script[type="application/json"], [itemprop="availability"]'
+)).map(node => node.outerHTML).join('\\n')
+'''
+
+# The page HTML before the item's end marker (case-insensitive, like
+# truncate_at_marker), cut in the page so the rest never crosses the socket
+PAGE_SOURCE_SCRIPT = '''
+(() => {
+    const html = document.documentElement.outerHTML;
+    const marker = %s;
+    const position = marker ? html.toLowerCase().indexOf(marker.toLowerCase()) : -1;
+    return position < 0 ? html : html.slice(0, position);
+})()
+'''
+
+
+class CdpError(Exception):
+    """Error response from Chrome, or the DevTools connection was lost"""
+
+
+class CdpConnection:
+    """
+    One WebSocket to the browser, shared by every check.
+
+    Pages are attached with flat sessions, so commands for all tabs go over
+    this socket tagged with their sessionId. A reader thread hands responses
+    to the waiting caller, queues events per session and fails requests
+    paused by Fetch interception (only blocked resource types are paused).
+    """
+
+    def __init__(self, ws_url: str):
+        import websocket
+
+        self.ws = websocket.create_connection(ws_url, suppress_origin=True, enable_multithread=True)
+        self.ids = itertools.count(1)
+        self.pending: Dict[int, list] = {}
+        self.event_queues: Dict[str, Queue] = {}
+        self.lock = threading.Lock()
+        self.closed = False
+        self.reader = threading.Thread(target=self._read_loop, daemon=True, name="CdpReader")
+        self.reader.start()
+
+    def _read_loop(self):
+        while not self.closed:
+            try:
+                message = json.loads(self.ws.recv())
+            except Exception:
+                break
+            if 'id' in message:
+                with self.lock:
+                    waiter = self.pending.pop(message['id'], None)
+                if waiter:
+                    waiter[1] = message
+                    waiter[0].set()
+            elif message.get('method') == 'Fetch.requestPaused':
+                try:
+                    self.send('Fetch.failRequest', {'requestId': message['params']['requestId'],
+                                                    'errorReason': 'BlockedByClient'},
+                              session_id=message.get('sessionId'), wait=False)
+                except Exception:
+                    pass
+            else:
+                queue = self.event_queues.get(message.get('sessionId'))
+                if queue is not None:
+                    queue.put(message)
+
+        # Wake everyone still waiting; the browser is gone
+        self.closed = True
+        with self.lock:
+            waiters = list(self.pending.values())
+            self.pending.clear()
+        for waiter in waiters:
+            waiter[0].set()
+
+    def send(self, method: str, params: Dict = None, session_id: str = None, timeout: float = 30.0,
+             wait: bool = True) -> Dict:
+        """Send a command and return its result; wait=False fires and forgets"""
+        if self.closed:
+            raise CdpError("DevTools connection closed")
+        message = {'id': next(self.ids), 'method': method, 'params': params or {}}
+        if session_id:
+            message['sessionId'] = session_id
+        waiter = [threading.Event(), None]
+        if wait:
+            with self.lock:
+                self.pending[message['id']] = waiter
+        self.ws.send(json.dumps(message))
+        if not wait:
+            return {}
+
+        if not waiter[0].wait(timeout):
+            with self.lock:
+                self.pending.pop(message['id'], None)
+            raise TimeoutError(f"{method} timed out")
+        response = waiter[1]
+        if response is None:
+            raise CdpError("DevTools connection closed")
+        if 'error' in response:
+            raise CdpError(f"{method}: {response['error'].get('message')}")
+        return response.get('result', {})
+
+    def open_session_events(self, session_id: str) -> Queue:
+        queue = self.event_queues[session_id] = Queue()
+        return queue
+
+    def close_session_events(self, session_id: str):
+        self.event_queues.pop(session_id, None)
+
+    def close(self):
+        self.closed = True
+        try:
+            self.ws.close()
+        except Exception:
+            pass
+
+
+class CdpScraper:
+    """
+    Checks pages with headless Chrome driven directly over the DevTools protocol.
+
+    A drop-in alternative to SeleniumScraper without chromedriver and its HTTP
+    round-trip per command. One Chrome process is launched on demand and each
+    check runs in a fresh browser context (isolated cookies, storage and
+    cache) that is disposed afterwards, so there is no reset step and no
+    liveness probe: a dead browser shows up as a closed socket and is
+    relaunched on the next check. Load detection is event driven
+    (Page.loadEventFired, then a MutationObserver quiet period instead of a
+    fixed sleep), images, media and fonts are blocked through Fetch
+    interception, and only the HTML the rule needs is pulled out with
+    Runtime.evaluate: the page up to the end marker, or just the
+    structured-data tags for a structured rule when the page itself isn't
+    wanted (see reads_partial_page).
+    """
+
+    def __init__(self, max_workers: int = 1, chrome_binary: str = None, page_load_timeout: float = 20.0,
+                 settle_quiet_ms: int = 300, settle_limit_ms: int = 3000):
+        self.max_workers = max_workers
+        self.chrome_binary = chrome_binary
+        self.page_load_timeout = page_load_timeout
+        self.settle_quiet_ms = settle_quiet_ms
+        self.settle_limit_ms = settle_limit_ms
+        self.check_semaphore = threading.Semaphore(max_workers)
+        self.browser_lock = threading.Lock()
+        self.process = None
+        self.profile_dir = None
+        self.connection: Optional[CdpConnection] = None
+        self.active_checks = 0
+        self.last_launch_seconds = None
+
+        atexit.register(self.cleanup)
+
+    @property
+    def driver_count(self) -> int:
+        """Browser instances in the SeleniumScraper sense; used by admission control"""
+        if not self._browser_alive():
+            return 0
+        return max(self.active_checks, 1)
+
+    def reads_partial_page(self, rule_type: str) -> bool:
+        """Whether a check without return_page_source reads less than the page"""
+        return rule_type == 'structured'
+
+    def _browser_alive(self) -> bool:
+        return (self.process is not None and self.process.poll() is None
+                and self.connection is not None and not self.connection.closed)
+
+    def _find_chrome(self) -> str:
+        binary = self.chrome_binary or os.environ.get('CHROME_BINARY')
+        if binary:
+            return binary
+        for name in CHROME_BINARIES:
+            path = shutil.which(name)
+            if path:
+                return path
+        raise CdpError("Chrome not found; set CHROME_BINARY")
+
+    def _ensure_browser(self) -> CdpConnection:
+        """Launch Chrome (or relaunch it if it died) and connect to it"""
+        with self.browser_lock:
+            if self._browser_alive():
+                return self.connection
+            self._shutdown_browser()
+
+            launch_started = time.perf_counter()
+            self.profile_dir = tempfile.mkdtemp(prefix='stock-tracker-chrome-')
+            self.process = subprocess.Popen(
+                [self._find_chrome(), *CHROME_ARGS, f'--user-data-dir={self.profile_dir}', 'about:blank'],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+
+            # Chrome writes the port it picked and the browser endpoint to this file
+            port_file = os.path.join(self.profile_dir, 'DevToolsActivePort')
+            deadline = time.time() + 20
+            while True:
+                if self.process.poll() is not None:
+                    raise CdpError(f"Chrome exited during startup (code {self.process.returncode})")
+                try:
+                    with open(port_file) as f:
+                        lines = f.read().split()
+                    if len(lines) >= 2:
+                        break
+                except OSError:
+                    pass
+                if time.time() > deadline:
+                    self._shutdown_browser()
+                    raise CdpError("Chrome did not open a DevTools port")
+                time.sleep(0.05)
+
+            self.connection = CdpConnection(f'ws://127.0.0.1:{lines[0]}{lines[1]}')
+            self.last_launch_seconds = time.perf_counter() - launch_started
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Chrome (CDP) launched in {self.last_launch_seconds:.2f}s")
+            return self.connection
+
+    def _shutdown_browser(self):
+        """Close the connection and Chrome (called with browser_lock held)"""
+        if self.connection:
+            try:
+                self.connection.send('Browser.close', timeout=5)
+            except Exception:
+                pass
+            self.connection.close()
+            self.connection = None
+        if self.process:
+            try:
+                self.process.wait(timeout=5)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+            self.process = None
+        if self.profile_dir:
+            shutil.rmtree(self.profile_dir, ignore_errors=True)
+            self.profile_dir = None
+
+    def _wait_for_event(self, connection: CdpConnection, events: Queue, method: str, deadline: float) -> Dict:
+        """Wait for a page event of the given method"""
+        while True:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                raise TimeoutError(f"Timed out waiting for {method}")
+            try:
+                event = events.get(timeout=min(remaining, 1))
+            except Empty:
+                if connection.closed:
+                    raise CdpError("DevTools connection closed")
+                continue
+            if event['method'] == method:
+                return event['params']
+
+    def _evaluate(self, connection: CdpConnection, session_id: str, expression: str, timeout: float):
+        result = connection.send('Runtime.evaluate', {
+            'expression': expression,
+            'awaitPromise': True,
+            'returnByValue': True,
+        }, session_id=session_id, timeout=timeout)
+        if 'exceptionDetails' in result:
+            raise CdpError(f"Script error: {result['exceptionDetails'].get('text')}")
+        return result['result'].get('value')
+
+    def check_availability(self, url: str, pattern: str, expected_count: int, return_page_source: bool = False,
+                           timings: Optional[dict] = None, rule_type: str = 'regex',
+                           end_marker: Optional[str] = None) -> Tuple[bool, Optional[str], Optional[str]]:
+        """
+        Same contract as SeleniumScraper.check_availability.
+        Returns (is_available, error_message, page_source)
+
+        Stages recorded in timings: driver_acquire (slot, browser and context),
+        page_load, settle, page_source, regex/extract, driver_reset (context disposal)
+        """
+        if timings is None:
+            timings = {}
+        stage_started = time.perf_counter()
+
+        def end_stage(stage):
+            nonlocal stage_started
+            now = time.perf_counter()
+            timings[stage] = now - stage_started
+            stage_started = now
+
+        if not self.check_semaphore.acquire(timeout=60):
+            end_stage('driver_acquire')
+            return False, CheckError("Check timeout - too many concurrent requests", errors.LOCAL), None
+
+        connection = None
+        context_id = None
+        session_id = None
+        # Timeouts before navigation are the browser's, after it the site's
+        navigated = False
+        with self.browser_lock:
+            self.active_checks += 1
+        try:
+            connection = self._ensure_browser()
+            context_id = connection.send('Target.createBrowserContext')['browserContextId']
+            target_id = connection.send('Target.createTarget', {
+                'url': 'about:blank', 'browserContextId': context_id
+            })['targetId']
+            session_id = connection.send('Target.attachToTarget', {
+                'targetId': target_id, 'flatten': True
+            })['sessionId']
+            events = connection.open_session_events(session_id)
+            connection.send('Page.enable', session_id=session_id)
+            connection.send('Fetch.enable', {'patterns': [
+                {'resourceType': resource_type, 'requestStage': 'Request'}
+                for resource_type in BLOCKED_RESOURCE_TYPES
+            ]}, session_id=session_id)
+            end_stage('driver_acquire')
+
+            deadline = time.time() + self.page_load_timeout
+            navigated = True
+            navigation = connection.send('Page.navigate', {'url': url}, session_id=session_id,
+                                         timeout=self.page_load_timeout)
+            if navigation.get('errorText'):
+                return False, CheckError(f"Navigation error: {navigation['errorText']}", errors.SITE), None
+            self._wait_for_event(connection, events, 'Page.loadEventFired', deadline)
+            end_stage('page_load')
+
+            self._evaluate(connection, session_id,
+                           SETTLE_SCRIPT % {'quiet': self.settle_quiet_ms, 'limit': self.settle_limit_ms},
+                           timeout=self.settle_limit_ms / 1000 + 5)
+            end_stage('settle')
+
+            if rule_type == 'structured' and not return_page_source:
+                page_source = self._evaluate(connection, session_id, STRUCTURED_SCRIPT, timeout=10)
+            else:
+                # The rule ignores everything after the end marker, so Chrome doesn't send it
+                page_source = self._evaluate(connection, session_id,
+                                             PAGE_SOURCE_SCRIPT % json.dumps(end_marker or ''), timeout=10) or ''
+            end_stage('page_source')
+
+            is_available, detail = apply_rule(page_source, rule_type, pattern, expected_count, end_marker)
+            end_stage('extract' if rule_type == 'structured' else 'regex')
+
+            print(f"URL: {url} | cdp | {detail} | available: {is_available}")
+            if is_available is None:
+                return False, CheckError("No structured availability data found", errors.ITEM), None
+            return is_available, None, page_source if return_page_source else None
+
+        except re.error as e:
+            return False, CheckError(f"Invalid rule pattern: {str(e)}", errors.ITEM), None
+        except TimeoutError:
+            if navigated:
+                return False, CheckError("Page load timeout", errors.SITE), None
+            return False, CheckError("Browser timeout", errors.LOCAL), None
+        except CdpError as e:
+            return False, CheckError(f"CDP error: {str(e)}", errors.LOCAL), None
+        except Exception as e:
+            return False, CheckError(f"Unexpected error: {str(e)}", errors.LOCAL), None
+        finally:
+            if session_id:
+                connection.close_session_events(session_id)
+            if context_id and not connection.closed:
+                # Closes the tab and drops its cookies, storage and cache in one call
+                try:
+                    connection.send('Target.disposeBrowserContext', {'browserContextId': context_id}, timeout=10)
+                except Exception as e:
+                    print(f"Error disposing browser context: {str(e)}")
+            end_stage('driver_reset')
+            with self.browser_lock:
+                self.active_checks -= 1
+            self.check_semaphore.release()
+
+    def close_idle_drivers(self, count: int) -> int:
+        """Shut Chrome down when asked to free memory and no check is using it"""
+        with self.browser_lock:
+            if count <= 0 or self.active_checks or not self._browser_alive():
+                return 0
+            self._shutdown_browser()
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Closed idle Chrome (CDP)")
+        return 1
+
+    def get_status(self) -> Dict:
+        alive = self._browser_alive()
+        return {
+            'backend': 'cdp',
+            'browsers': 1 if alive else 0,
+            'active_checks': self.active_checks,
+            'idle_browsers': 1 if alive and not self.active_checks else 0,
+            'max_browsers': 1,
+            'max_concurrent_checks': self.max_workers,
+            'last_launch_seconds': round(self.last_launch_seconds, 3) if self.last_launch_seconds is not None else None,
+        }
+
+    def cleanup(self):
+        """Close Chrome and remove its temporary profile"""
+        with self.browser_lock:
+            self._shutdown_browser()
@@ -0,0 +1,25 @@
+# Kinds of check errors. Only site errors (the retailer failed to serve the
+# page) count against a domain's circuit breaker; local errors (no browser,
+# Chrome crashed, too many concurrent checks) and item errors (a page or rule
+# problem of one item) must not pause the other items of the domain.
+SITE = 'site'
+LOCAL = 'local'
+ITEM = 'item'
+
+
+class CheckError(str):
+    """
+    Error message returned by check_availability, tagged with its kind.
+
+    It is still a plain string to callers that only print or compare it.
+    """
+
+    def __new__(cls, message: str, kind: str = SITE):
+        error = super().__new__(cls, message)
+        error.kind = kind
+        return error
+
+
+def error_kind(error) -> str:
+    """Kind of an error returned by a scraper; untagged errors count as site errors"""
+    return getattr(error, 'kind', SITE)
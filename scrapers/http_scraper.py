@@ -0,0 +1,132 @@
+import codecs
+import re
+import threading
+import time
+from typing import Optional, Tuple
+
+import requests
+
+from app.rules import IncrementalMatcher, apply_rule
+from scrapers import errors
+from scrapers.errors import CheckError
+
+USER_AGENT = ('Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 '
+              '(KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36')
+
+
+class HttpScraper:
+    """
+    Checks items with a plain HTTP GET instead of a browser.
+
+    No JavaScript runs, so this only suits pages whose stock state is in the
+    HTML the server sends, which is where schema.org and embedded state data
+    usually live. It takes milliseconds and a few MB of memory instead of a
+    browser page load. Each worker thread keeps its own keep-alive session.
+
+    Pattern rules are applied while the body streams in, and the download
+    stops as soon as the rule is decided (see IncrementalMatcher), so an
+    out-of-stock match near the top of a 2 MB page costs one chunk.
+    """
+
+    def __init__(self, timeout: float = 20.0, max_bytes: int = 10 * 1024 * 1024, chunk_size: int = 64 * 1024):
+        self.timeout = timeout
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self._local = threading.local()
+
+    def _session(self) -> requests.Session:
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            session = self._local.session = requests.Session()
+            session.headers.update({
+                'User-Agent': USER_AGENT,
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'en-US,en;q=0.9',
+            })
+        return session
+
+    def reads_partial_page(self, rule_type: str) -> bool:
+        """Whether a check without return_page_source reads less than the page"""
+        return True
+
+    def check_availability(self, url: str, pattern: str, expected_count: int, return_page_source: bool = False,
+                           timings: Optional[dict] = None, rule_type: str = 'regex',
+                           end_marker: Optional[str] = None) -> Tuple[bool, Optional[str], Optional[str]]:
+        """
+        Same contract as SeleniumScraper.check_availability.
+        Returns (is_available, error_message, page_source)
+
+        Reading stops early once a pattern rule has enough matches or the
+        end marker has been read. The page is only held in memory with
+        return_page_source or for structured rules (which parse it whole);
+        then it is read in full, up to the end marker.
+        Stages recorded in timings: http_fetch, regex (while streaming) or extract
+        """
+        if timings is None:
+            timings = {}
+        stage_started = time.perf_counter()
+        structured = rule_type == 'structured'
+        try:
+            matcher = IncrementalMatcher(None if structured else pattern, expected_count, end_marker=end_marker)
+        except re.error as e:
+            return False, CheckError(f"Invalid rule pattern: {str(e)}", errors.ITEM), None
+        parts = [] if return_page_source or structured else None
+        bytes_read = 0
+        complete = False
+
+        try:
+            with self._session().get(url, timeout=(5, self.timeout), stream=True) as response:
+                if response.status_code >= 400:
+                    # 5xx and rate limiting are the site's trouble; other 4xx (404 on a
+                    # discontinued product, ...) are a problem of this item's URL
+                    site_error = response.status_code >= 500 or response.status_code == 429
+                    return False, CheckError(f"HTTP error: {response.status_code}",
+                                             errors.SITE if site_error else errors.ITEM), None
+                # Without a charset requests assumes ISO-8859-1 for text/*; HTML is almost always UTF-8
+                content_type = response.headers.get('Content-Type', '')
+                encoding = response.encoding if 'charset' in content_type.lower() else 'utf-8'
+                try:
+                    decoder = codecs.getincrementaldecoder(encoding or 'utf-8')(errors='replace')
+                except LookupError:
+                    decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    bytes_read += len(chunk)
+                    if bytes_read > self.max_bytes:
+                        return False, CheckError(f"Response larger than {self.max_bytes} bytes", errors.ITEM), None
+                    text = decoder.decode(chunk)
+                    if parts is not None:
+                        parts.append(text)
+                    matcher.feed(text)
+                    if matcher.done and (parts is None or matcher.marker_seen):
+                        # Leaving the with-block closes the connection without reading the rest
+                        break
+                else:
+                    complete = True
+                    text = decoder.decode(b'', final=True)
+                    if parts is not None:
+                        parts.append(text)
+                    matcher.feed(text)
+                    matcher.finish()
+        except requests.Timeout:
+            return False, CheckError("Page load timeout", errors.SITE), None
+        except requests.RequestException as e:
+            return False, CheckError(f"HTTP error: {str(e)}", errors.SITE), None
+        finally:
+            timings['http_fetch'] = time.perf_counter() - stage_started - matcher.seconds
+
+        page_source = ''.join(parts) if parts is not None else None
+        if structured:
+            stage_started = time.perf_counter()
+            is_available, detail = apply_rule(page_source, rule_type, pattern, expected_count, end_marker)
+            timings['extract'] = time.perf_counter() - stage_started
+        else:
+            timings['regex'] = matcher.seconds
+            is_available = matcher.is_available
+            detail = f"matches: {matcher.match_count}/{expected_count}"
+
+        read = f"{bytes_read // 1024} KB" + ('' if complete else ' (stopped early)')
+        print(f"URL: {url} | http {read} | {detail} | available: {is_available}")
+        if is_available is None:
+            return False, CheckError("No structured availability data found", errors.ITEM), None
+        return is_available, None, page_source if return_page_source else None
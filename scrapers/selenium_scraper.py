@@ -1,17 +1,19 @@
-from selenium import webdriver
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, WebDriverException
 import re
 import time
+import socket
+from datetime import datetime
 from typing import Tuple, Optional
 import threading
-from queue import Queue
+from queue import Queue, Empty
 import atexit
 
+from app.rules import apply_rule
+from scrapers import errors
+from scrapers.errors import CheckError
+
+# Selenium is imported inside the methods that use it so that importing this
+# module (and starting the web app) stays fast until a browser is needed.
+
 class SeleniumScraper:
     _instance = None
     _lock = threading.Lock()
@@ -23,7 +25,7 @@ class SeleniumScraper:
                     cls._instance = super().__new__(cls)
         return cls._instance
     
-    def __init__(self, headless: bool = True, max_workers: int = 1):
+    def __init__(self, headless: bool = True, max_workers: int = 1, browser_mode: str = 'process'):
         # Initialize only once
         if hasattr(self, '_initialized'):
             return
@@ -31,65 +33,107 @@ class SeleniumScraper:
         self._initialized = True
         self.headless = headless
         self.max_workers = max_workers
+        # 'process': one Chrome per pool slot; 'tabs': one shared Chrome, each slot
+        # is a tab in its own browser context (see _create_tab_driver)
+        if browser_mode not in ('process', 'tabs'):
+            raise ValueError(f"Unknown browser mode: {browser_mode}")
+        self.browser_mode = browser_mode
+        self.host_driver = None
+        self.host_lock = threading.Lock()
+        self.debugger_address = None
         self.driver_pool = Queue(maxsize=max_workers)
         self.pool_lock = threading.Lock()
         self.check_semaphore = threading.Semaphore(max_workers)
-        
-        # Initialize driver pool
-        self._initialize_pool()
+        # Browsers are launched on demand; this counts live ones (pooled or in use)
+        self.driver_count = 0
+        self.last_launch_seconds = None
         
         # Register cleanup
         atexit.register(self.cleanup)
     
-    def _initialize_pool(self):
-        """Initialize the driver pool with reusable browser instances"""
-        for _ in range(self.max_workers):
-            try:
-                driver = self.create_driver()
-                if driver:
-                    self.driver_pool.put(driver)
-            except Exception as e:
-                print(f"Error creating driver for pool: {str(e)}")
+    def _launch_driver(self):
+        """Create a driver for a slot already counted in driver_count"""
+        try:
+            driver = self.create_driver()
+        except Exception as e:
+            print(f"Error creating driver for pool: {str(e)}")
+            driver = None
+        if not driver:
+            with self.pool_lock:
+                self.driver_count -= 1
+        return driver
     
     def get_driver(self, timeout: int = 30):
-        """Get a driver from the pool or create a new one if needed"""
-        try:
-            driver = self.driver_pool.get(timeout=timeout)
-            # Test if driver is still alive
+        """Get a driver from the pool, launching one if the pool is not full yet"""
+        deadline = time.time() + timeout
+        while True:
             try:
-                _ = driver.title
-                return driver
-            except:
-                # Driver is dead, create a new one
-                return self.create_driver()
+                driver = self.driver_pool.get_nowait()
+                break
+            except Empty:
+                pass
+            with self.pool_lock:
+                can_launch = self.driver_count < self.max_workers
+                if can_launch:
+                    self.driver_count += 1
+            if can_launch:
+                return self._launch_driver()
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                # Pool is empty and timeout reached
+                return None
+            try:
+                # Wake up now and then: a broken driver frees its slot without
+                # putting anything in the pool
+                driver = self.driver_pool.get(timeout=min(remaining, 1))
+                break
+            except Empty:
+                continue
+        
+        # Test if driver is still alive
+        try:
+            _ = driver.title
+            return driver
         except:
-            # Pool is empty and timeout reached
-            return None
+            # Driver is dead, replace it in the same slot
+            self._quit_driver(driver)
+            return self._launch_driver()
     
     def return_driver(self, driver):
         """Return a driver to the pool"""
         if driver:
             try:
-                # Clear cookies and reset state
-                driver.delete_all_cookies()
-                driver.get("about:blank")
+                if self.browser_mode == 'tabs':
+                    # Swap in a fresh browser context: new cookies, storage and cache
+                    self._reset_tab(driver)
+                else:
+                    # Clear cookies and reset state
+                    driver.delete_all_cookies()
+                    driver.get("about:blank")
                 self.driver_pool.put(driver)
             except:
-                # Driver is broken, don't return to pool
-                try:
-                    driver.quit()
-                except:
-                    pass
-                # Try to maintain pool size
-                try:
-                    new_driver = self.create_driver()
-                    if new_driver:
-                        self.driver_pool.put(new_driver)
-                except:
-                    pass
+                # Driver is broken, don't return to pool; a new one is launched on next demand
+                self._quit_driver(driver)
+                with self.pool_lock:
+                    self.driver_count -= 1
+    
+    def _quit_driver(self, driver):
+        """Quit a pooled driver, closing its tab first in tabs mode"""
+        try:
+            context_id = getattr(driver, 'tracker_context_id', None)
+            if context_id:
+                driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': context_id})
+        except:
+            pass
+        try:
+            driver.quit()
+        except:
+            pass
+    
+    def _chrome_options(self):
+        """Chrome options with optimized settings for low memory"""
+        from selenium.webdriver.chrome.options import Options
         
-    def create_driver(self):
-        """Create a new Chrome driver instance with optimized settings for low memory"""
         chrome_options = Options()
         
         if self.headless:
@@ -130,10 +174,23 @@ class SeleniumScraper:
             }
         }
         chrome_options.add_experimental_option("prefs", prefs)
+        return chrome_options
+    
+    def create_driver(self):
+        """Create a new Chrome driver instance with optimized settings for low memory"""
+        from selenium import webdriver
+        
+        if self.browser_mode == 'tabs':
+            return self._create_tab_driver()
+        
+        launch_started = time.perf_counter()
+        chrome_options = self._chrome_options()
         
         try:
             driver = webdriver.Chrome(options=chrome_options)
             driver.set_page_load_timeout(20)  # Reduced timeout
+            self.last_launch_seconds = time.perf_counter() - launch_started
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Browser launched in {self.last_launch_seconds:.2f}s")
             return driver
         except Exception as e:
             print(f"Error creating Chrome driver: {str(e)}")
@@ -147,9 +204,88 @@ class SeleniumScraper:
             firefox_options.set_preference("browser.cache.memory.enable", False)
             driver = webdriver.Firefox(options=firefox_options)
             driver.set_page_load_timeout(20)
+            self.last_launch_seconds = time.perf_counter() - launch_started
             return driver
     
-    def check_availability(self, url: str, pattern: str, expected_count: int, return_page_source: bool = False) -> Tuple[bool, Optional[str], Optional[str]]:
+    def _ensure_host(self):
+        """Launch the shared Chrome for tabs mode, or relaunch it if it died"""
+        from selenium import webdriver
+        
+        with self.host_lock:
+            if self.host_driver is not None:
+                try:
+                    _ = self.host_driver.title
+                    return
+                except:
+                    try:
+                        self.host_driver.quit()
+                    except:
+                        pass
+                    self.host_driver = None
+            
+            # Pick a free port for DevTools so tab sessions can attach to this browser
+            with socket.socket() as sock:
+                sock.bind(('127.0.0.1', 0))
+                port = sock.getsockname()[1]
+            
+            launch_started = time.perf_counter()
+            chrome_options = self._chrome_options()
+            chrome_options.add_argument(f"--remote-debugging-port={port}")
+            self.host_driver = webdriver.Chrome(options=chrome_options)
+            self.debugger_address = f"127.0.0.1:{port}"
+            self.last_launch_seconds = time.perf_counter() - launch_started
+            print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Shared browser launched in {self.last_launch_seconds:.2f}s at {self.debugger_address}")
+    
+    def _open_context_tab(self, driver):
+        """Open a tab in a new isolated browser context and switch the driver to it"""
+        context = driver.execute_cdp_cmd('Target.createBrowserContext', {})
+        target = driver.execute_cdp_cmd('Target.createTarget', {
+            'url': 'about:blank',
+            'browserContextId': context['browserContextId']
+        })
+        # ChromeDriver window handles are DevTools target ids
+        driver.switch_to.window(target['targetId'])
+        driver.tracker_context_id = context['browserContextId']
+    
+    def _create_tab_driver(self):
+        """
+        Create a pool slot backed by a tab of the shared browser.
+        
+        Each slot is its own ChromeDriver session attached to the shared Chrome
+        over DevTools, so slots run commands concurrently, but they share one
+        browser and GPU process. Every slot's tab lives in a separate browser
+        context (like an incognito profile), which isolates cookies, storage
+        and cache between concurrent checks.
+        """
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        
+        self._ensure_host()
+        
+        attach_options = Options()
+        attach_options.debugger_address = self.debugger_address
+        driver = webdriver.Chrome(options=attach_options)
+        try:
+            self._open_context_tab(driver)
+            driver.set_page_load_timeout(20)
+        except:
+            self._quit_driver(driver)
+            raise
+        return driver
+    
+    def _reset_tab(self, driver):
+        """Replace the slot's browser context; disposing the old one closes its tab and data"""
+        old_context_id = driver.tracker_context_id
+        self._open_context_tab(driver)
+        driver.execute_cdp_cmd('Target.disposeBrowserContext', {'browserContextId': old_context_id})
+    
+    def reads_partial_page(self, rule_type: str) -> bool:
+        """Whether a check without return_page_source reads less than the page"""
+        return False
+    
+    def check_availability(self, url: str, pattern: str, expected_count: int, return_page_source: bool = False,
+                           timings: Optional[dict] = None, rule_type: str = 'regex',
+                           end_marker: Optional[str] = None) -> Tuple[bool, Optional[str], Optional[str]]:
         """
         Check if an item is available based on pattern matching.
         Returns (is_available, error_message, page_source)
@@ -163,61 +299,123 @@ class SeleniumScraper:
             pattern: Regex pattern to search for
             expected_count: Number of matches that indicate out of stock
             return_page_source: Whether to return the page source (for logging)
+            timings: Optional dict filled with the seconds spent in each stage
+                (driver_acquire, page_load, body_wait, settle, page_source, regex/extract, driver_reset)
+            rule_type: 'regex' for the pattern rule above, 'structured' to read
+                schema.org / embedded availability data instead
+            end_marker: Only apply the rule to the page text before this marker
         """
+        from selenium.webdriver.common.by import By
+        from selenium.webdriver.support.ui import WebDriverWait
+        from selenium.webdriver.support import expected_conditions as EC
+        from selenium.common.exceptions import TimeoutException, WebDriverException
+        
+        if timings is None:
+            timings = {}
+        stage_started = time.perf_counter()
+        
+        def end_stage(stage):
+            nonlocal stage_started
+            now = time.perf_counter()
+            timings[stage] = now - stage_started
+            stage_started = now
+        
         # Acquire semaphore to limit concurrent checks
         if not self.check_semaphore.acquire(timeout=60):
-            return False, "Check timeout - too many concurrent requests", None
+            end_stage('driver_acquire')
+            return False, CheckError("Check timeout - too many concurrent requests", errors.LOCAL), None
         
         driver = None
         try:
             driver = self.get_driver(timeout=30)
+            end_stage('driver_acquire')
             if not driver:
-                return False, "Could not acquire browser instance", None
+                return False, CheckError("Could not acquire browser instance", errors.LOCAL), None
             
             driver.get(url)
+            end_stage('page_load')
             
             # Wait for page to load with shorter timeout
             WebDriverWait(driver, 10).until(
                 EC.presence_of_element_located((By.TAG_NAME, "body"))
             )
+            end_stage('body_wait')
             
             # Reduced wait for dynamic content
             time.sleep(1)
+            end_stage('settle')
             
             # Get page source
             page_source = driver.page_source
+            end_stage('page_source')
             
-            # Count pattern matches
-            matches = re.findall(pattern, page_source, re.IGNORECASE)
-            match_count = len(matches)
-            
-            # If matches >= expected_count, item is OUT OF STOCK
-            is_available = match_count < expected_count
+            # Count pattern matches (or read structured data); matches >= expected_count is OUT OF STOCK
+            is_available, detail = apply_rule(page_source, rule_type, pattern, expected_count, end_marker)
+            end_stage('extract' if rule_type == 'structured' else 'regex')
             
-            print(f"URL: {url}")
-            print(f"Pattern: {pattern}")
-            print(f"Matches found: {match_count}")
-            print(f"Expected count for out of stock: {expected_count}")
-            print(f"Is available: {is_available}")
+            print(f"URL: {url} | {detail} | available: {is_available}")
+            if is_available is None:
+                return False, CheckError("No structured availability data found", errors.ITEM), None
             
             return is_available, None, page_source if return_page_source else None
             
+        except re.error as e:
+            return False, CheckError(f"Invalid rule pattern: {str(e)}", errors.ITEM), None
         except TimeoutException:
-            return False, "Page load timeout", None
+            return False, CheckError("Page load timeout", errors.SITE), None
         except WebDriverException as e:
-            return False, f"WebDriver error: {str(e)}", None
+            # net::ERR_* are the site's network errors; anything else is the browser itself
+            kind = errors.SITE if 'net::ERR_' in str(e) else errors.LOCAL
+            return False, CheckError(f"WebDriver error: {str(e)}", kind), None
         except Exception as e:
-            return False, f"Unexpected error: {str(e)}", None
+            return False, CheckError(f"Unexpected error: {str(e)}", errors.LOCAL), None
         finally:
-            self.check_semaphore.release()
+            # Give the driver (or its slot) back before admitting the next check, so
+            # that check never waits on an empty pool the way it would in between
             if driver:
+                stage_started = time.perf_counter()
                 self.return_driver(driver)
+                end_stage('driver_reset')
+            self.check_semaphore.release()
+    
+    def close_idle_drivers(self, count: int) -> int:
+        """Quit up to count idle browsers to free memory; returns how many were closed"""
+        closed = 0
+        while closed < count:
+            try:
+                driver = self.driver_pool.get_nowait()
+            except Empty:
+                break
+            self._quit_driver(driver)
+            with self.pool_lock:
+                self.driver_count -= 1
+            closed += 1
+        return closed
+    
+    def get_status(self) -> dict:
+        """Get browser pool usage"""
+        return {
+            'browsers': self.driver_count,
+            'idle_browsers': self.driver_pool.qsize(),
+            'max_browsers': self.max_workers,
+            'browser_mode': self.browser_mode,
+            'last_launch_seconds': self.last_launch_seconds
+        }
     
     def cleanup(self):
         """Clean up all drivers in the pool"""
         while not self.driver_pool.empty():
             try:
                 driver = self.driver_pool.get_nowait()
-                driver.quit()
+                self._quit_driver(driver)
+                with self.pool_lock:
+                    self.driver_count -= 1
             except:
-                pass 
\ No newline at end of file
+                pass
+        with self.host_lock:
+            if self.host_driver is not None:
+                try:
+                    self.host_driver.quit()
+                except:
+                    pass
+                self.host_driver = None
\ No newline at end of file
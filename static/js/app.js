@@ -2,18 +2,24 @@
 let items = [];
 let emails = [];
 let editingItemId = null;
+let timelines = {};
+let timelineWindow = '24h';
 
 // Initialize app
 document.addEventListener('DOMContentLoaded', () => {
     loadItems();
     loadEmails();
     updateTrackerStatus();
+    loadTimelines();
     
     // Refresh data every 5 seconds
     setInterval(() => {
         loadItems();
         updateTrackerStatus();
     }, 5000);
+    
+    // Timelines are hours long; refreshing them every minute is plenty
+    setInterval(loadTimelines, 60000);
 });
 
 // API Functions
@@ -50,6 +56,49 @@ async function loadItems() {
     }
 }
 
+// Load uptime and sparklines of all items in one call
+async function loadTimelines() {
+    try {
+        const response = await apiCall('/api/items/timelines');
+        timelines = response.items;
+        renderItems();
+    } catch (error) {
+        console.error('Failed to load timelines:', error);
+    }
+}
+
+function toggleTimelineWindow() {
+    timelineWindow = timelineWindow === '24h' ? '7d' : '24h';
+    renderItems();
+}
+
+function formatUptime(uptime) {
+    return uptime === null ? 'n/a' : `${(uptime * 100).toFixed(1)}%`;
+}
+
+function renderTimeline(item) {
+    const timeline = timelines[item.id];
+    if (!timeline) {
+        return '';
+    }
+    
+    const buckets = timeline[timelineWindow].sparkline.map(value => {
+        const state = value === null ? 'unknown' : value === 1 ? 'up' : value === 0 ? 'down' : 'mixed';
+        const title = value === null ? 'No data' : `${Math.round(value * 100)}% available`;
+        return `<span class="timeline-bucket ${state}" title="${title}"></span>`;
+    }).join('');
+    
+    return `
+        <div class="item-timeline">
+            <div class="timeline-bar">${buckets}</div>
+            <div class="timeline-uptime" onclick="toggleTimelineWindow()" title="Switch between 24h and 7d">
+                ${timelineWindow} · uptime 24h ${formatUptime(timeline['24h'].uptime)},
+                7d ${formatUptime(timeline['7d'].uptime)}
+            </div>
+        </div>
+    `;
+}
+
 // Load emails
 async function loadEmails() {
     try {
@@ -114,10 +163,15 @@ function renderItems() {
                 </div>
                 
                 <div class="item-rule">
-                    Pattern: "${escapeHtml(item.rule_pattern)}"<br>
-                    Out of stock when matches ≥ ${item.rule_count}
+                    ${item.rule_type === 'structured'
+                        ? 'Structured data (schema.org / embedded JSON)'
+                        : `Pattern: "${escapeHtml(item.rule_pattern)}"<br>
+                    Out of stock when matches ≥ ${item.rule_count}`}<br>
+                    Fetched with ${item.fetch_mode === 'http' ? 'HTTP' : 'browser'}
                 </div>
                 
+                ${renderTimeline(item)}
+                
                 <div class="item-details">
                     ${item.last_checked ? `Last checked: ${item.last_checked}` : 'Not checked yet'}
                 </div>
@@ -167,6 +221,7 @@ function showAddItemModal() {
     editingItemId = null;
     document.getElementById('item-modal-title').textContent = 'Add New Item';
     document.getElementById('item-form').reset();
+    updateRuleFields();
     document.getElementById('item-modal').classList.add('show');
 }
 
@@ -180,9 +235,22 @@ function editItem(id) {
     document.getElementById('item-url').value = item.url;
     document.getElementById('item-pattern').value = item.rule_pattern;
     document.getElementById('item-count').value = item.rule_count;
+    document.getElementById('item-rule-type').value = item.rule_type || 'regex';
+    document.getElementById('item-fetch-mode').value = item.fetch_mode || 'browser';
+    document.getElementById('item-end-marker').value = item.end_marker || '';
+    updateRuleFields();
     document.getElementById('item-modal').classList.add('show');
 }
 
+// Pattern fields only apply to pattern rules
+function updateRuleFields() {
+    const structured = document.getElementById('item-rule-type').value === 'structured';
+    document.querySelectorAll('.regex-rule-field').forEach(field => {
+        field.style.display = structured ? 'none' : '';
+        field.querySelector('input').required = !structured;
+    });
+}
+
 function closeItemModal() {
     document.getElementById('item-modal').classList.remove('show');
     editingItemId = null;
@@ -196,7 +264,10 @@ async function saveItem(event) {
         name: formData.get('name'),
         url: formData.get('url'),
         rule_pattern: formData.get('rule_pattern'),
-        rule_count: parseInt(formData.get('rule_count'))
+        rule_count: parseInt(formData.get('rule_count')) || 1,
+        rule_type: formData.get('rule_type'),
+        fetch_mode: formData.get('fetch_mode'),
+        end_marker: formData.get('end_marker')
     };
     
     try {
@@ -221,6 +292,28 @@ async function saveItem(event) {
     }
 }
 
+// Import items from a CSV or JSON file (same columns as the export)
+async function importItems(event) {
+    const file = event.target.files[0];
+    event.target.value = '';
+    if (!file) {
+        return;
+    }
+    
+    const format = file.name.toLowerCase().endsWith('.csv') ? 'csv' : 'json';
+    try {
+        const result = await apiCall(`/api/items/import?format=${format}`, {
+            method: 'POST',
+            headers: {'Content-Type': format === 'csv' ? 'text/csv' : 'application/json'},
+            body: await file.text()
+        });
+        showNotification(`${result.message}; first checks spread over ${result.first_checks_over}s`, 'success');
+        loadItems();
+    } catch (error) {
+        console.error('Failed to import items:', error);
+    }
+}
+
 async function deleteItem(id) {
     if (!confirm('Are you sure you want to delete this item?')) return;
     
@@ -0,0 +1,78 @@
+"""
+Headless tracker worker.
+
+Runs StockTracker on its own, without the Flask web server. The web app
+(started with TRACKER_PROCESS=external) sends force checks through the
+tracker_commands table and reads the status this worker publishes to the
+tracker_status table.
+
+Usage:
+    python worker.py [--check-interval 60] [--max-concurrent 1] [--mode local|distributed]
+"""
+import argparse
+import os
+import signal
+import threading
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from app.models import Database
+from app.stock_tracker import create_tracker
+from app.tracker_control import ControlChannel
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Run a headless stock tracker worker")
+    parser.add_argument('--db', default=os.environ.get('DATABASE_PATH', 'stock_tracker.db'),
+                        help="Path to the SQLite database shared with the web app")
+    parser.add_argument('--check-interval', type=int, help="Seconds between checks of each item (CHECK_INTERVAL)")
+    parser.add_argument('--max-concurrent', type=int, help="Concurrent browser checks (MAX_CONCURRENT_CHECKS)")
+    parser.add_argument('--mode', choices=['local', 'distributed'], help="Work sharing mode (TRACKER_MODE)")
+    parser.add_argument('--node-id', help="Stable node name (NODE_ID)")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+
+    # Command line flags override the environment used by create_tracker
+    overrides = {
+        'CHECK_INTERVAL': args.check_interval,
+        'MAX_CONCURRENT_CHECKS': args.max_concurrent,
+        'TRACKER_MODE': args.mode,
+        'NODE_ID': args.node_id,
+    }
+    for key, value in overrides.items():
+        if value is not None:
+            os.environ[key] = str(value)
+
+    print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Worker starting, PID: {os.getpid()}")
+
+    db = Database(args.db)
+    tracker = create_tracker(db)
+    control = ControlChannel(tracker, db)
+
+    stop_event = threading.Event()
+
+    def handle_signal(signum, frame):
+        print(f"[{datetime.now().strftime('%Y-%m-%d %H:%M:%S')}] Received signal {signum}, shutting down")
+        stop_event.set()
+
+    signal.signal(signal.SIGINT, handle_signal)
+    signal.signal(signal.SIGTERM, handle_signal)
+
+    tracker.start()
+    control.start()
+    try:
+        while not stop_event.wait(1):
+            pass
+    finally:
+        control.stop()
+        tracker.stop()
+
+
+if __name__ == '__main__':
+    main()